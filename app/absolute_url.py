@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from api.v1.auth import accounts
 from api.v1.chat_room import chat_room
+from api.stats import stats
 from fastapi.routing import APIWebSocketRoute 
 from sockets.wsocket import chat_websocket_endpoint
 
@@ -8,6 +9,7 @@ from sockets.wsocket import chat_websocket_endpoint
 def get_absolute_url(app: FastAPI):
     app.include_router(accounts, prefix="/api/v1/auth")
     app.include_router(chat_room, prefix="/api/v1/chat_room")
+    app.include_router(stats, prefix="/stats", tags=["Stats"])
     
     # Register the WebSocket endpoint
     app.router.routes.append(APIWebSocketRoute('/ws/chat', chat_websocket_endpoint))
@@ -2,12 +2,15 @@ import random
 import typing
 from fastapi import status
 from fastapi.requests import Request
-from utils.helpers import get_payload
+from utils.helpers import get_payload, convert_str_to_binary_uuid
 from fastapi.exceptions import HTTPException
 from utils.security import generate_device_id, generate_device_hash_for_validation
 from db.db_connection import get_database
+from db.redis.session_cache import session_cache
+from db.devices import find_device_account
 from fastapi import HTTPException, Request, status, Depends
 from fastapi.websockets import WebSocket
+from utils import settings as st
 
 
 async def is_authenticated_user(
@@ -37,25 +40,36 @@ async def is_authenticated_user(
             detail=get_payload(message="Random device uuid ID is required in headers."),
         )
 
-    # Fetch account details and validate device_id
-    accounts_details = await db["accounts"].find_one(
-        {"device_info.device_id": device_id}
-    )
-    if not accounts_details:
+    cached_session = await session_cache.get(device_id, user_id, random_device_uuid)
+    if cached_session is not None:
+        accounts_details, device_hash = cached_session
+        if device_identity_hash != device_hash:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=get_payload(message="Unauthorized user."),
+            )
+        accounts_details["device_id"] = device_id
+        return accounts_details
+
+    is_valid, user_uuid = convert_str_to_binary_uuid(user_id)
+    if not is_valid:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=get_payload(message="Device not registered."),
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=get_payload(message="Invalid user id."),
         )
 
-    if str(accounts_details.get("user_id", None)) != user_id:
+    # Fetch account details of the registered (user_id, device_id) pair
+    accounts_details = await find_device_account(db, user_uuid, device_id)
+    if not accounts_details:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=get_payload(message="Invalid user id."),
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=get_payload(message="Device not registered."),
         )
 
-    if device_identity_hash != generate_device_hash_for_validation(
+    device_hash = generate_device_hash_for_validation(
         user_id=user_id, device_id=device_id, random_device_uuid=random_device_uuid
-    ):
+    )
+    if device_identity_hash != device_hash:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=get_payload(message="Unauthorized user."),
@@ -73,6 +87,9 @@ async def is_authenticated_user(
             detail=get_payload(message="Email is not verified."),
         )
 
+    await session_cache.set(
+        device_id, user_id, random_device_uuid, accounts_details, device_hash
+    )
     accounts_details["device_id"] = device_id
     return accounts_details
 
@@ -90,9 +107,8 @@ async def is_authenticated_user_websocket(
     #     await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
 
     # Fetch account details and validate device_id
-    accounts_details = await db["accounts"].find_one(
-        {"device_info.device_id": device_id}
-    )
+    _, user_uuid = convert_str_to_binary_uuid(user_id)
+    accounts_details = await find_device_account(db, user_uuid, device_id)
     # if not accounts_details:
     #     await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
 
@@ -113,3 +129,15 @@ async def is_authenticated_user_websocket(
 
     accounts_details["device_id"] = device_id
     return accounts_details
+
+
+async def is_internal_request(request: Request):
+    """
+    Gate for internal diagnostics: the X-Stats-Token header must match the
+    STATS_TOKEN setting, and without that setting nothing gets through.
+    """
+    if not st.STATS_TOKEN or request.headers.get("x-stats-token") != st.STATS_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=get_payload(message="Not allowed."),
+        )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from api.dependencies import is_internal_request
+from db.db_connection import MongoClientRegistry
+from sockets import connection_manager, chat_manager
+from utils.executors import cpu_executor
+from utils.mail_queue import mail_queue
+
+# Internal diagnostics; every route requires the X-Stats-Token header.
+stats = APIRouter(dependencies=[Depends(is_internal_request)])
+
+
+@stats.get('/db-pool')
+async def db_pool_stats():
+    return MongoClientRegistry.pool_stats()
+
+
+@stats.get('/websockets')
+async def websocket_stats():
+    return connection_manager.stats()
+
+
+@stats.get('/message-writes')
+async def message_write_stats():
+    return chat_manager.message_buffer.stats()
+
+
+@stats.get('/cpu-executor')
+async def cpu_executor_stats():
+    return cpu_executor.stats()
+
+
+@stats.get('/mail-queue')
+async def mail_queue_stats():
+    return mail_queue.stats()
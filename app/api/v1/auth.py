@@ -1,6 +1,6 @@
 from fastapi import APIRouter, status
 from utils.helpers import get_payload
-from fastapi.responses import JSONResponse
+from serializer.fast_json import FastJSONResponse
 from fastapi.exceptions import HTTPException
 from schemas.auth import (
     UserRegisteration,
@@ -8,20 +8,25 @@ from schemas.auth import (
     LoginWithCredentials,
     OTPVerifySchema,
     ContactsNo,
+    ContactsSync,
 )
 from fastapi.requests import Request
 from pymongo.errors import DuplicateKeyError
 from utils.security import (
-    hash_password,
-    is_authenticated,
+    hash_password_async,
+    is_authenticated_async,
     generate_device_id,
     combined_device_info,
 )
-from utils.emails import simple_mailer
+from utils.mail_queue import mail_queue
+from utils.user_import import UserImporter, IMPORT_FORMATS
+from utils.contacts import dedupe_contacts, diff_contacts, contact_sync_operations
 from utils import settings as st
 from utils.helpers import generate_token, generate_otp, verify_token
 from datetime import datetime, timedelta, timezone
 from api.dependencies import is_authenticated_user
+from db.redis.session_cache import session_cache
+from db.devices import upsert_device
 from fastapi import Depends
 
 # from utils.security import get_random_uuid
@@ -78,7 +83,7 @@ async def register_user(request: Request, user_registeration: UserRegisteration)
 
     try:
         del deserialized_user_data["confirm_password"]
-        deserialized_user_data["password"] = hash_password(
+        deserialized_user_data["password"] = await hash_password_async(
             deserialized_user_data["password"]
         )
 
@@ -90,11 +95,7 @@ async def register_user(request: Request, user_registeration: UserRegisteration)
 
         # Insert the user data.
         await user_collection.insert_one(deserialized_user_data)
-
-        # get the user data.
-        user_data = await user_collection.find_one(
-            {"email": deserialized_user_data["email"]}
-        )
+        user_data = deserialized_user_data
 
         if user_data:
             scheme = request.url.scheme  # http or https
@@ -102,7 +103,7 @@ async def register_user(request: Request, user_registeration: UserRegisteration)
             port = request.url.port
             link = f"{scheme}://{host}:{port}/api/v1/auth/verify-email?token={user_data['email_verification_token']}"
             print("LINK: ", link)
-            simple_mailer(
+            mail_queue.enqueue(
                 template_file=st.REGISTERATION_EMAIL_TEMPLATE,
                 context={"user_data": user_data, "link": link},
                 to_emails=[user_data["email"]],
@@ -112,32 +113,102 @@ async def register_user(request: Request, user_registeration: UserRegisteration)
                 message=f"Account has been created and send the 6 digit code for account verification at your registered email: {user_data['email']}",
                 ok=True,
             )
-            return JSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
+            return FastJSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
 
     except DuplicateKeyError as dke:
         if "email" in str(dke):
-            return JSONResponse(
+            return FastJSONResponse(
                 content=get_payload(message="Email already registered, "),
                 status_code=status.HTTP_409_CONFLICT,
             )
         elif "mobile_no" in str(dke):
-            return JSONResponse(
+            return FastJSONResponse(
                 content=get_payload("Mobile number already registered."),
                 status_code=status.HTTP_409_CONFLICT,
             )
         else:
-            return JSONResponse(
+            return FastJSONResponse(
                 content=get_payload("Duplicate entry detected."),
                 status_code=status.HTTP_409_CONFLICT,
             )
 
     except Exception as e:
         payload = get_payload(message=f"An un-expected error occurse: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@accounts.post(
+    "/bulk-import",
+    description="""
+    Registers many users from one CSV or NDJSON request body.
+
+    The body is read as a stream and imported in batches. Rows that fail
+    validation or clash with an existing email or mobile number are reported
+    by row number; every other row is created and sent a verification email.
+
+    Headers:
+    -----------
+    "X-Import-Token (Required, str)": "Must match the USER_IMPORT_TOKEN setting.",
+    "Content-Type": "text/csv or application/x-ndjson, unless `format` is given.",
+
+    Query Parameters:
+    -----------
+    "format (Optional, str)": "csv or ndjson.",
+
+    Example:
+    --------
+    Method: POST /api/v1/auth/bulk-import?format=csv
+    Body:
+        email,mobile_no,password
+        johndoe@example.com,1234567890,securepassword123
+    """,
+)
+async def bulk_import_users(request: Request, format: str = None):
+    if not st.USER_IMPORT_TOKEN or request.headers.get(
+        "x-import-token"
+    ) != st.USER_IMPORT_TOKEN:
+        return FastJSONResponse(
+            content=get_payload(message="Bulk import is not allowed."),
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    content_type = request.headers.get("content-type", "")
+    import_format = format or ("ndjson" if "ndjson" in content_type else "csv")
+    if import_format not in IMPORT_FORMATS:
+        return FastJSONResponse(
+            content=get_payload(
+                message=f"format must be one of {', '.join(IMPORT_FORMATS)}."
+            ),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    link_base = f"{request.url.scheme}://{request.client.host}:{request.url.port}"
+    try:
+        importer = UserImporter(request.app.db, link_base=link_base)
+        report = await importer.run(request.stream(), import_format)
+    except UnicodeDecodeError:
+        return FastJSONResponse(
+            content=get_payload(message="The body must be UTF-8 encoded."),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    except Exception as e:
+        payload = get_payload(message=f"An un-expected error occurse: {e}")
+        return FastJSONResponse(
+            content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return FastJSONResponse(
+        content=get_payload(
+            message=f"Imported {report['inserted']} of {report['received']} users.",
+            ok=True,
+            details=report,
+        ),
+        status_code=status.HTTP_200_OK,
+    )
+
+
 @accounts.post("/resend-verification-email")
 async def resend_email(
     request: Request, resend_verification_email: ResentVerificationEmail
@@ -151,14 +222,14 @@ async def resend_email(
 
     # Check if the user exists
     if not user_data:
-        return JSONResponse(
+        return FastJSONResponse(
             content=get_payload(message="The provided email does not exist."),
             status_code=status.HTTP_404_NOT_FOUND,
         )
 
     # Check if the account is already verified
     if user_data.get("is_email_verified", False):
-        return JSONResponse(
+        return FastJSONResponse(
             content=get_payload(
                 message="Your account is already verified. No need to resend the verification email."
             ),
@@ -179,7 +250,7 @@ async def resend_email(
             },
         )
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             content=get_payload(
                 message=f"An unexpected error occurred while updating the database: {e}"
             ),
@@ -193,14 +264,14 @@ async def resend_email(
         port = request.url.port
         link = f"{scheme}://{host}:{port}/api/v1/auth/verify-email?token={verification_token}"
         print("LINK: ", link)
-        simple_mailer(
+        mail_queue.enqueue(
             template_file=st.REGISTERATION_EMAIL_TEMPLATE,
             context={"user_data": user_data, "link": link},
             to_emails=[email],
             subject="Welcome To Leo Chat.",
         )
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             content=get_payload(
                 message=f"Failed to send email. An error occurred: {e}"
             ),
@@ -208,7 +279,7 @@ async def resend_email(
         )
 
     # Success response
-    return JSONResponse(
+    return FastJSONResponse(
         content=get_payload(
             message=f"Verification email has been sent successfully to: {email}.",
             ok=True,
@@ -229,17 +300,17 @@ async def verify_email(request: Request, token: str):
 
     except ValueError as ve:
         payload = get_payload(message=f"{ve}")
-        return JSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
 
     user = await user_collection.find_one({"email": email})
     if not user:
         payload = get_payload(message=f"User not found")
-        return JSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
 
     if user.get("is_email_verified", False):
         message = "Account has been already verified."
         payload = get_payload(message=message)
-        return JSONResponse(content=payload, status_code=status.HTTP_409_CONFLICT)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_409_CONFLICT)
 
     # Update user as verified
     filter = {"email": email}
@@ -252,17 +323,18 @@ async def verify_email(request: Request, token: str):
     }
     try:
         await user_collection.update_one(filter, update)
+        await session_cache.invalidate_user(user["user_id"])
         message = "Account has been successfully verified."
 
     except Exception as e:
         message = f"An un expected error Occurse: {e}"
         payload = get_payload(message=message)
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
     payload = get_payload(message=message, ok=True)
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content=payload, status_code=status.HTTP_200_OK)
 
 
 @accounts.post("/login-with-credentials")
@@ -278,36 +350,24 @@ async def login_with_credentials(
     )
     if not user_data:
         payload = get_payload(message="User does not exists.")
-        return JSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
 
-    if not is_authenticated(user_data, deserialized_user_credentials):
+    if not await is_authenticated_async(user_data, deserialized_user_credentials):
         payload = get_payload(message="Invalid Credentials.")
-        return JSONResponse(content=payload, status_code=status.HTTP_401_UNAUTHORIZED)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_401_UNAUTHORIZED)
 
     try:
         # Generate a pseudo Device ID using a hash
         device_info = combined_device_info(request, user_data["email"])
         device_info["is_logged_in"] = True
 
-        # Update the device info if `device_id` exists, otherwise push a new entry
-        result = await user_collection.update_one(
-            {
-                "email": user_data["email"],
-                "device_info.device_id": device_info["device_id"],
-            },
-            {"$set": {"device_info.$": device_info}},  # Update the matching device info
-        )
-
-        # If no device was updated, push the new device info
-        if result.matched_count == 0:
-            await user_collection.update_one(
-                {"email": user_data["email"]},
-                {"$push": {"device_info": device_info}},
-            )
+        # Insert or refresh the device in a single upsert
+        await upsert_device(db, user_data["user_id"], device_info)
+        await session_cache.invalidate_device(device_info["device_id"])
 
     except Exception as e:
         payload = get_payload(message=f"An un-expected error Occurse: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
@@ -320,7 +380,7 @@ async def login_with_credentials(
             "user_id": f"{user_data['user_id']}",
         },
     )
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content=payload, status_code=status.HTTP_200_OK)
 
 
 @accounts.post("/sent-login-otp")
@@ -335,7 +395,7 @@ async def login_with_otp(request: Request, login: ResentVerificationEmail):
     user_data = await user_collection.find_one({"email": email})
     if not user_data:
         payload = get_payload(message="User does not exists.")
-        return JSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
 
     # Generate and save OTP with expiration
     otp = generate_otp()
@@ -357,7 +417,7 @@ async def login_with_otp(request: Request, login: ResentVerificationEmail):
     )
     # Send OTP via email
     try:
-        simple_mailer(
+        mail_queue.enqueue(
             template_file=st.OTP_EMAIL_TEMPLATE,
             context={
                 "user_data": user_data["otp"],
@@ -376,7 +436,7 @@ async def login_with_otp(request: Request, login: ResentVerificationEmail):
     payload = get_payload(
         message=f"OTP sent to your registered email: {user_data['email']} ", ok=True
     )
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content=payload, status_code=status.HTTP_200_OK)
 
 
 @accounts.post("/verify-otp")
@@ -390,19 +450,19 @@ async def verify_otp(request: Request, otp_verify: OTPVerifySchema):
 
     if not user_data:
         payload = get_payload(message="User not found")
-        return JSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_404_NOT_FOUND)
 
     if otp_verify["login_otp"] != user_data["otp"]["login_otp"]:
         message = "Invalid OTP"
         payload = get_payload(message=message)
-        return JSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
 
     if datetime.now(tz=timezone.utc) > datetime.strptime(
         f"{user_data['otp']['login_otp_expiration']}", st.TZ_OFFSET_FORMAT
     ).replace(tzinfo=timezone.utc):
         message = "OTP Expired."
         payload = get_payload(message=message)
-        return JSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_400_BAD_REQUEST)
 
     # Generate a pseudo Device ID using a hash
     device_id = generate_device_id(request, user_data["email"])
@@ -412,21 +472,9 @@ async def verify_otp(request: Request, otp_verify: OTPVerifySchema):
         device_info = combined_device_info(request, user_data["email"])
         device_info["is_logged_in"] = True
 
-        # Update the device info if `device_id` exists, otherwise push a new entry
-        result = await user_collection.update_one(
-            {
-                "email": user_data["email"],
-                "device_info.device_id": device_info["device_id"],
-            },
-            {"$set": {"device_info.$": device_info}},  # Update the matching device info
-        )
-
-        # If no device was updated, push the new device info
-        if result.matched_count == 0:
-            await user_collection.update_one(
-                {"email": user_data["email"]},
-                {"$push": {"device_info": device_info}},
-            )
+        # Insert or refresh the device in a single upsert
+        await upsert_device(db, user_data["user_id"], device_info)
+        await session_cache.invalidate_device(device_info["device_id"])
 
     except Exception as e:
         raise HTTPException(
@@ -443,7 +491,7 @@ async def verify_otp(request: Request, otp_verify: OTPVerifySchema):
             "user_id": f"{user_data['user_id']}",
         },
     )
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content=payload, status_code=status.HTTP_200_OK)
 
 
 # Helper Function to Check for Duplicates
@@ -463,6 +511,65 @@ async def has_account(db, email: str) -> bool:
     return True
 
 
+@accounts.post("/sync-contacts")
+async def sync_contacts(
+    request: Request,
+    contacts_sync: ContactsSync,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Upload an address book, or a part of it, in one request.
+
+    Contacts are deduplicated by email (by number when they have none),
+    `has_account` is resolved for all of them with one query and the
+    changes are applied with one bulk write. Returns which contacts were
+    added, updated or unchanged.
+    """
+    db = request.app.db
+    user_collection = db["accounts"]
+    filter = {"email": account_details["email"]}
+    incoming = dedupe_contacts(
+        [contact.model_dump() for contact in contacts_sync.contacts]
+    )
+
+    try:
+        emails = [contact["email"] for contact in incoming.values() if contact["email"]]
+        registered = set()
+        if emails:
+            async for account in user_collection.find(
+                {"email": {"$in": emails}}, {"_id": 0, "email": 1}
+            ):
+                registered.add(account["email"])
+        for contact in incoming.values():
+            contact["has_account"] = contact["email"] in registered
+
+        # Compare with the stored list, not the possibly cached one.
+        account = await user_collection.find_one(filter, {"_id": 0, "contacts_info": 1})
+        diff = diff_contacts((account or {}).get("contacts_info") or [], incoming)
+
+        operations = contact_sync_operations(filter, diff)
+        if operations:
+            await user_collection.bulk_write(operations, ordered=True)
+            await session_cache.invalidate_user(account_details["user_id"])
+
+        payload = get_payload(
+            message="Contacts synced successfully.",
+            ok=True,
+            details={
+                "added": diff["added"],
+                "updated": diff["updated"],
+                "unchanged": len(diff["unchanged"]),
+            },
+        )
+        return FastJSONResponse(content=payload, status_code=status.HTTP_200_OK)
+
+    except Exception as e:
+        payload = get_payload(message=f"An un-expected error Occurse: {e}")
+        return FastJSONResponse(
+            content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @accounts.post("/add-contacts")
 async def add_contact(
     request: Request,
@@ -488,12 +595,13 @@ async def add_contact(
 
     try:
         await user_collection.update_one(filter, _update)
+        await session_cache.invalidate_user(account_details["user_id"])
         payload = get_payload(message="Contact added successfully.", ok=True)
-        return JSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
 
     except Exception as e:
         payload = get_payload(message=f"An un-expected error Occurse: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
@@ -520,11 +628,12 @@ async def update_contact_detail(
 
     try:
         await user_collection.update_one(filter, _update)
+        await session_cache.invalidate_user(account_details["user_id"])
         payload = get_payload(message="Contacted added successfully.", ok=True)
-        return JSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
+        return FastJSONResponse(content=payload, status_code=status.HTTP_201_CREATED)
 
     except Exception as e:
         payload = get_payload(message=f"An un-expected error Occurse: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -1,16 +1,27 @@
-import json
 from fastapi import APIRouter
 from fastapi import Request
-from utils.helpers import generate_room_id, convert_str_to_binary_uuid
-from schemas.chat import ChatRoom, MessageModel
-from fastapi.responses import JSONResponse
-from pymongo.errors import DuplicateKeyError
+from utils.helpers import (
+    convert_str_to_binary_uuid,
+    decode_history_cursor,
+    to_utc,
+)
+from schemas.chat import ChatRoom, BulkChatRooms, MessageModel, ReadReceipt
+from fastapi.responses import Response, StreamingResponse
+from serializer.fast_json import FastJSONResponse, dumps
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from utils.helpers import get_payload
 from fastapi import status
 from api.dependencies import is_authenticated_user
 from fastapi import Depends
-from db.db_parser.parser import DBParsers
-from db.redis.redis_connection import Redis
+from db.db_parser.parser import DBParsers, history_cursors
+from db.redis.recent_messages import recent_messages
+from db.redis.response_cache import chat_list_cache, etag_matches
+from sockets import room_membership, connection_manager, chat_manager
+from db.read_watermarks import read_watermarks, resolve_read_at, unread_after
+from db.redis.unread_counters import unread_counters
+from db.rooms import room_uuid, find_missing_accounts, find_rooms
+from serializer.ndjson import stream_ndjson
+from utils import settings as st
 
 chat_room = APIRouter()
 
@@ -33,35 +44,32 @@ async def create_or_get_room(
     for member_id in members:
         is_valid, binary_uuid = convert_str_to_binary_uuid(member_id)
         if not is_valid:
-            return JSONResponse(
+            return FastJSONResponse(
                 content=get_payload(message=f"Invalid UUID for member: {member_id}"),
                 status_code=status.HTTP_400_BAD_REQUEST,
             )
-
-        # Check if the member exists in the accounts collection
-        account_info = await db["accounts"].find_one({"user_id": binary_uuid})
-        if not account_info:
-            return JSONResponse(
-                content=get_payload(message=f"User not found: {member_id}"),
-                status_code=status.HTTP_404_NOT_FOUND,
-            )
         members_ls.append(binary_uuid)
 
-    # Generate a unique room ID
-    room_id = generate_room_id(members)
-    is_valid, binary_room_id = convert_str_to_binary_uuid(room_id[:32])
-    if not is_valid:
-        return JSONResponse(
-            content=get_payload(message="Invalid generated room ID!"),
-            status_code=status.HTTP_400_BAD_REQUEST,
+    # Check that every member has an account, in a single query
+    missing_members = await find_missing_accounts(db, members_ls)
+    if missing_members:
+        return FastJSONResponse(
+            content=get_payload(
+                message=f"User not found: {', '.join(sorted(str(member) for member in missing_members))}"
+            ),
+            status_code=status.HTTP_404_NOT_FOUND,
         )
 
+    # Generate a unique room ID
+    binary_room_id = room_uuid(members)
+
     # Check if the chat room already exists
     existing_chat_room = await chat_room_collection.find_one(
         {"room_id": binary_room_id}
     )
     if existing_chat_room:
-        return JSONResponse(
+        room_membership.set(binary_room_id, existing_chat_room.get("members", []))
+        return FastJSONResponse(
             content=get_payload(
                 message="Chat Room already exists.",
                 details={"room_id": str(existing_chat_room.get("room_id", None))},
@@ -73,24 +81,159 @@ async def create_or_get_room(
     try:
         chatroom_data.update({"room_id": binary_room_id, "members": members_ls})
         await chat_room_collection.insert_one(chatroom_data)
+        room_membership.set(binary_room_id, members_ls)
 
-        return JSONResponse(
+        return FastJSONResponse(
             content=get_payload(
                 message="Chat Room created successfully.",
                 ok=True,
-                details={"room_id": str(binary_room_id.as_uuid())},
+                details={"room_id": str(binary_room_id)},
             ),
             status_code=status.HTTP_201_CREATED,
         )
 
     except DuplicateKeyError:
-        return JSONResponse(
+        room_membership.invalidate(binary_room_id)
+        return FastJSONResponse(
             content=get_payload(message="Chat Room already exists."),
             status_code=status.HTTP_409_CONFLICT,
         )
 
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
+            content=get_payload(message=f"Unexpected error occurred: {str(e)}"),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@chat_room.post("/bulk-create")
+async def bulk_create_rooms(
+    request: Request,
+    bulk_rooms: BulkChatRooms,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Create many rooms in one request.
+
+    Room ids are derived from the members exactly like `/create`, so a
+    repeated request reports the rooms as existing instead of duplicating
+    them. Members of all rooms are validated with one query and the new
+    rooms are written with one `insert_many`.
+    """
+    db = request.app.db
+    chat_room_collection = db["chat_room"]
+
+    errors = []
+    rooms = {}
+    for index, chatroom in enumerate(bulk_rooms.rooms):
+        chatroom_data = chatroom.model_dump()
+        members_ls = []
+        for member_id in chatroom_data["members"]:
+            is_valid, binary_uuid = convert_str_to_binary_uuid(member_id)
+            if not is_valid:
+                errors.append(
+                    {"index": index, "error": f"Invalid UUID for member: {member_id}"}
+                )
+                break
+            members_ls.append(binary_uuid)
+        else:
+            binary_room_id = room_uuid(chatroom_data["members"])
+            chatroom_data.update({"room_id": binary_room_id, "members": members_ls})
+            # A room listed twice is created once.
+            rooms.setdefault(binary_room_id, (index, chatroom_data))
+
+    try:
+        missing_members = await find_missing_accounts(
+            db, {member for _, room in rooms.values() for member in room["members"]}
+        )
+        existing_rooms = await find_rooms(db, list(rooms))
+
+        new_rooms = []
+        for binary_room_id, (index, room) in rooms.items():
+            if binary_room_id in existing_rooms:
+                continue
+            missing = missing_members.intersection(room["members"])
+            if missing:
+                errors.append(
+                    {
+                        "index": index,
+                        "error": f"User not found: {', '.join(sorted(str(member) for member in missing))}",
+                    }
+                )
+            else:
+                new_rooms.append(room)
+
+        failed = set()
+        if new_rooms:
+            try:
+                await chat_room_collection.insert_many(new_rooms, ordered=False)
+            except BulkWriteError as bwe:
+                for error in bwe.details.get("writeErrors", []):
+                    room = new_rooms[error["index"]]
+                    if error.get("code") == 11000:
+                        # Created concurrently by another request.
+                        room_membership.invalidate(room["room_id"])
+                        existing_rooms.setdefault(room["room_id"], None)
+                    else:
+                        errors.append(
+                            {"index": rooms[room["room_id"]][0], "error": error["errmsg"]}
+                        )
+                    failed.add(room["room_id"])
+
+    except Exception as e:
+        return FastJSONResponse(
+            content=get_payload(message=f"Unexpected error occurred: {str(e)}"),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    created = []
+    for room in new_rooms:
+        if room["room_id"] not in failed:
+            room_membership.set(room["room_id"], room["members"])
+            created.append(str(room["room_id"]))
+    for binary_room_id, members in existing_rooms.items():
+        if members is not None:
+            room_membership.set(binary_room_id, members)
+
+    return FastJSONResponse(
+        content=get_payload(
+            message=f"Created {len(created)} chat rooms.",
+            ok=not errors,
+            details={
+                "created": created,
+                "existing": [str(binary_room_id) for binary_room_id in existing_rooms],
+                "errors": sorted(errors, key=lambda error: error["index"]),
+            },
+        ),
+        status_code=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+
+def cached_response(body: bytes, etag: str, if_none_match: str = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@chat_room.get("/unread")
+async def unread_counts(
+    request: Request,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Unread message count of every room with unread messages, keyed by
+    room id, for badges. One HGETALL, no aggregation.
+    """
+    try:
+        counts = await unread_counters.counts(account_details["user_id"])
+        return FastJSONResponse(
+            content=get_payload(message="Unread counts.", ok=True, details=counts),
+            status_code=status.HTTP_200_OK,
+        )
+
+    except Exception as e:
+        return FastJSONResponse(
             content=get_payload(message=f"Unexpected error occurred: {str(e)}"),
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
@@ -102,41 +245,231 @@ async def chat_list(
     room_id: str,
     page: int = 1,
     size: int = 50,
+    before: str = None,
+    after: str = None,
     account_details=Depends(is_authenticated_user),
 ):
-    collection_name = "chat_room"
+    """
+    Newest-first chat history of a room.
+
+    `before`/`after` are the opaque cursors returned in `meta_info` of a
+    previous page and take precedence over `page`.
+    """
+    collection_name = "user_messages"
     db = request.app.db
 
-    _db_parser = DBParsers(db, collection_name=collection_name)
+    if before and after:
+        return FastJSONResponse(
+            content=get_payload(message="Use either before or after cursor, not both."),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
 
-    # Create a unique Redis cache key for the room_id, page, and size
-    cache_key = f"chat_list:{room_id}:page:{page}:size:{size}"
-    redis_instance = await Redis.query_key(key=cache_key)
+    is_valid, binary_room_id = convert_str_to_binary_uuid(room_id)
+    if not is_valid:
+        return FastJSONResponse(
+            content=get_payload(message=f"Invalid room id: {room_id}"),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
 
     try:
-        # update the messages unseen to seen.
-        # db['chat_room'].find({})
+        before_cursor = decode_history_cursor(before) if before else None
+        after_cursor = decode_history_cursor(after) if after else None
+    except ValueError as ve:
+        return FastJSONResponse(
+            content=get_payload(message=f"{ve}"),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
 
-        if redis_instance is None:
-            serialized_user_info_result = await _db_parser.get_user_info_result(
-                room_id=room_id, page=page, size=size
-            )
-            await Redis.insert_val(
-                key=cache_key, value=json.dumps(serialized_user_info_result)
-            )
+    room_key = str(binary_room_id)
+    if_none_match = request.headers.get("if-none-match")
+
+    # A hit is written back as stored, without decoding it.
+    cache_field = f"{page}:{size}:{before or ''}:{after or ''}"
+    etag, body, generation = await chat_list_cache.get(room_key, cache_field)
+    if body is not None:
+        return cached_response(body, etag, if_none_match)
+
+    _db_parser = DBParsers(db, collection_name=collection_name)
+
+    try:
+        serialized_history = None
+        if not before_cursor and not after_cursor:
+            # The first pages are served from the recent-messages list.
+            serialized_history = await recent_messages.page(room_key, page, size)
 
+            if serialized_history is None and recent_messages.covers(page, size):
+                newest, _ = await _db_parser.get_room_history(
+                    room_id=room_key, size=recent_messages.size
+                )
+                await recent_messages.hydrate(room_key, newest)
+                start = (page - 1) * size
+                serialized_history = newest[start : start + size]
+
+        if serialized_history is None:
+            serialized_history, cursors = await _db_parser.get_room_history(
+                room_id=room_key,
+                page=page,
+                size=size,
+                before=before_cursor,
+                after=after_cursor,
+            )
         else:
-            serialized_user_info_result = json.loads(redis_instance)
+            cursors = history_cursors(serialized_history)
 
         payload = get_payload(
-            message="User Messages.", ok=True, details=serialized_user_info_result
+            message="User Messages.",
+            ok=True,
+            details=serialized_history,
+            meta_info={"cursors": cursors},
         )
-        return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+        body = dumps(payload)
+        etag = await chat_list_cache.set(room_key, cache_field, body, generation)
+        return cached_response(body, etag, if_none_match)
 
     except Exception as e:
-        # print("Error: ", e)
+        # Nothing was cached or hydrated from the failed read.
+        print("Error: ", e)
         payload = get_payload(message="An un-expected error Occurse.")
-        return JSONResponse(
+        return FastJSONResponse(
             content=payload, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+@chat_room.get("/{room_id}/export")
+async def export_chat_history(
+    request: Request,
+    room_id: str,
+    gzip: bool = False,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Stream the full history of a room, oldest first, as NDJSON, or as
+    gzip-compressed NDJSON with `gzip=true`.
+    """
+    is_valid, binary_room_id = convert_str_to_binary_uuid(room_id)
+    if not is_valid:
+        return FastJSONResponse(
+            content=get_payload(message=f"Invalid room id: {room_id}"),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if not await room_membership.is_member(binary_room_id, account_details["user_id"]):
+        return FastJSONResponse(
+            content=get_payload(message="You are not a member of this room."),
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    _db_parser = DBParsers(request.app.db, collection_name="user_messages")
+    messages = _db_parser.stream_room_history(
+        room_id=str(binary_room_id), batch_size=st.EXPORT_BATCH_SIZE
+    )
+    filename = f"room-{binary_room_id}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_ndjson(messages, compress=gzip, chunk_size=st.EXPORT_CHUNK_SIZE),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@chat_room.post("/{room_id}/read")
+async def mark_room_read(
+    request: Request,
+    room_id: str,
+    receipt: ReadReceipt,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Mark everything in the room read up to `read_at`, up to `message_id`,
+    or up to now. One write however many messages it covers; members
+    connected to the room get a read receipt.
+    """
+    is_valid, binary_room_id = convert_str_to_binary_uuid(room_id)
+    if not is_valid:
+        return FastJSONResponse(
+            content=get_payload(message=f"Invalid room id: {room_id}"),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    user_id = account_details["user_id"]
+    if not await room_membership.is_member(binary_room_id, user_id):
+        return FastJSONResponse(
+            content=get_payload(message="You are not a member of this room."),
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        read_at = await resolve_read_at(
+            binary_room_id,
+            read_at=receipt.read_at,
+            message_id=receipt.message_id,
+            message_buffer=chat_manager.message_buffer,
+        )
+        if read_at is None:
+            return FastJSONResponse(
+                content=get_payload(message="Message not found."),
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+
+        read_at = await read_watermarks.mark_read(user_id, binary_room_id, read_at)
+        unread = await unread_after(
+            binary_room_id, user_id, read_at, message_buffer=chat_manager.message_buffer
+        )
+        await unread_counters.set(user_id, binary_room_id, unread)
+        await connection_manager.broadcast_event(
+            room_id=room_id,
+            event={
+                "type": "read",
+                "user_id": str(user_id),
+                "read_at": to_utc(read_at),
+            },
+        )
+        return FastJSONResponse(
+            content=get_payload(
+                message="Marked as read.",
+                ok=True,
+                details={"read_at": read_at, "unread": unread},
+            ),
+            status_code=status.HTTP_200_OK,
+        )
+
+    except Exception as e:
+        return FastJSONResponse(
+            content=get_payload(message=f"Unexpected error occurred: {str(e)}"),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@chat_room.get("/{room_id}/read")
+async def room_read_state(
+    request: Request,
+    room_id: str,
+    account_details=Depends(is_authenticated_user),
+):
+    """
+    Read watermark of every member of the room, keyed by user id.
+    """
+    is_valid, binary_room_id = convert_str_to_binary_uuid(room_id)
+    if not is_valid:
+        return FastJSONResponse(
+            content=get_payload(message=f"Invalid room id: {room_id}"),
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if not await room_membership.is_member(binary_room_id, account_details["user_id"]):
+        return FastJSONResponse(
+            content=get_payload(message="You are not a member of this room."),
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        watermarks = await read_watermarks.room(binary_room_id)
+        return FastJSONResponse(
+            content=get_payload(message="Read watermarks.", ok=True, details=watermarks),
+            status_code=status.HTTP_200_OK,
+        )
+
+    except Exception as e:
+        return FastJSONResponse(
+            content=get_payload(message=f"Unexpected error occurred: {str(e)}"),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
@@ -1,20 +1,66 @@
-from db.db_parser.pipeline import user_message_info_pipeline
-from serializer.data_serializer import MongoEncoder
+from db.db_parser.pipeline import room_history_pipeline, room_export_pipeline
+from db.db_connection import MongoClientRegistry
+from datetime import datetime
+from utils.helpers import encode_history_cursor
+
+
+def history_cursors(messages: list) -> dict:
+    """
+    `before`/`after` cursors of the oldest and newest entries of a
+    newest-first page.
+    """
+    cursors = {"before": None, "after": None}
+    if messages:
+        newest, oldest = messages[0], messages[-1]
+        cursors["after"] = encode_history_cursor(
+            iso_sent_at(newest["sent_at"]), newest["message_id"]
+        )
+        cursors["before"] = encode_history_cursor(
+            iso_sent_at(oldest["sent_at"]), oldest["message_id"]
+        )
+    return cursors
+
+
+def iso_sent_at(sent_at) -> str:
+    # Mongo pages carry datetimes, cached pages their ISO strings.
+    return sent_at.isoformat() if isinstance(sent_at, datetime) else sent_at
 
 
 class DBParsers:
-    def __init__(self, db, collection_name) -> None:
-        self.db = db
+    def __init__(self, db=None, collection_name=None) -> None:
+        self.db = db if db is not None else MongoClientRegistry.get_database()
         self.collection_name = collection_name
 
-    async def get_user_info_result(self, room_id: str, page: int=1, size: int=50):
-        pipeline = user_message_info_pipeline(room_id=room_id, page=page, size=size)
-        user_info_cursor = self.db[self.collection_name].aggregate(pipeline)
-        
-        try:
-            serialized_user_info = await MongoEncoder.serialize_list(user_info_cursor)
-            # print("SERIALIZED DATA: ", serialized_user_info)
-        except Exception as e:
-            print("ERROR: ", e)
-            serialized_user_info = []
-        return serialized_user_info
+    async def get_room_history(
+        self,
+        room_id: str,
+        page: int = 1,
+        size: int = 50,
+        before: tuple = None,
+        after: tuple = None,
+    ):
+        """
+        Return one newest-first page of a room's messages together with the
+        `before`/`after` cursors of its oldest and newest entries. Documents
+        are returned as read; `serializer.fast_json` encodes them.
+
+        Read errors propagate: an empty page must mean an empty room, since
+        callers cache it.
+        """
+        pipeline = room_history_pipeline(
+            room_id=room_id, page=page, size=size, before=before, after=after
+        )
+        history_cursor = self.db[self.collection_name].aggregate(pipeline)
+        serialized_history = await history_cursor.to_list(length=None)
+        return serialized_history, history_cursors(serialized_history)
+
+    async def stream_room_history(self, room_id: str, batch_size: int = 1000):
+        """
+        Yield every message of a room oldest first, fetching `batch_size`
+        documents per round trip so memory stays flat for any room size.
+        """
+        history_cursor = self.db[self.collection_name].aggregate(
+            room_export_pipeline(room_id=room_id), batchSize=batch_size
+        )
+        async for message in history_cursor:
+            yield message
@@ -1,41 +1,92 @@
 from uuid import UUID
+from datetime import datetime
 
 
-def user_message_info_pipeline(room_id: str, page: int = 1, size: int = 50):
-    skip_value = (page - 1) * size
+def keyset_match(sent_at: datetime, message_id: UUID, operator: str) -> dict:
+    """
+    Match messages strictly before (`$lt`) or after (`$gt`) the
+    `(sent_at, message_id)` position of a cursor.
+    """
+    return {
+        "$or": [
+            {"sent_at": {operator: sent_at}},
+            {"sent_at": sent_at, "message_id": {operator: message_id}},
+        ]
+    }
+
+
+def room_history_pipeline(
+    room_id: str,
+    page: int = 1,
+    size: int = 50,
+    before: tuple = None,
+    after: tuple = None,
+):
+    """
+    Newest-first history of one room, served by the
+    `(room_id, sent_at, message_id)` index on `user_messages`.
+
+    `before`/`after` are decoded `(sent_at, message_id)` cursors. Without a
+    cursor the page number is applied with `$skip`.
+    """
+    match = {"room_id": UUID(room_id)}
+    sort_direction = -1
+
+    if before is not None:
+        match.update(keyset_match(*before, operator="$lt"))
+    elif after is not None:
+        match.update(keyset_match(*after, operator="$gt"))
+        # Walk forward from the cursor, then restore newest-first order.
+        sort_direction = 1
+
     pipeline = [
+        {"$match": match},
+        {"$sort": {"sent_at": sort_direction, "message_id": sort_direction}},
+    ]
+    if before is None and after is None:
+        pipeline.append({"$skip": (page - 1) * size})
+    pipeline.append({"$limit": size})
+
+    if sort_direction == 1:
+        pipeline.append({"$sort": {"sent_at": -1, "message_id": -1}})
+
+    return pipeline + message_projection_stages()
+
+
+def room_export_pipeline(room_id: str):
+    """
+    Full history of one room, oldest first, walking the
+    `(room_id, sent_at, message_id)` index.
+    """
+    return [
+        {"$match": {"room_id": UUID(room_id)}},
+        {"$sort": {"sent_at": 1, "message_id": 1}},
+    ] + message_projection_stages()
+
+
+def message_projection_stages():
+    """
+    Resolve `sent_by` to the sender's email and keep the public fields.
+    """
+    return [
         {
             "$lookup": {
-                "from": "user_messages",
-                "localField": "room_id",
-                "foreignField": "room_id",
-                "as": "messages_result",
-                "pipeline": [
-                    {"$match": {"room_id": UUID(room_id)}},
-                    {
-                        "$lookup": {
-                            "from": "accounts",
-                            "localField": "sent_by",
-                            "foreignField": "user_id",
-                            "as": "user_info",
-                        }
-                    },
-                ],
+                "from": "accounts",
+                "localField": "sent_by",
+                "foreignField": "user_id",
+                "as": "user_info",
+                "pipeline": [{"$project": {"_id": 0, "email": 1}}],
             }
         },
-        {"$unwind": {"path": "$messages_result"}},
-        {"$unwind": {"path": "$messages_result.user_info"}},
-        {"$skip": skip_value},
-        {"$limit": size},
+        {"$unwind": {"path": "$user_info", "preserveNullAndEmptyArrays": True}},
         {
             "$project": {
                 "_id": 0,
-                "message_id": "$messages_result.message_id",
-                "message": "$messages_result.message",
-                "is_read": "$messages_result.is_read",
-                "sent_at": "$messages_result.sent_at",
-                "sent_by": "$messages_result.user_info.email",
+                "message_id": 1,
+                "message": 1,
+                "is_read": 1,
+                "sent_at": 1,
+                "sent_by": "$user_info.email",
             }
         },
     ]
-    return pipeline
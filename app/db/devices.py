@@ -0,0 +1,49 @@
+from uuid import UUID
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from db.redis.session_cache import ACCOUNT_PROJECTION
+
+DEVICES_COLLECTION = "devices"
+
+
+async def upsert_device(db, user_id: UUID, device_info: dict):
+    """
+    Record a login of `device_info` for `user_id` in one round trip. The
+    unique `(user_id, device_id)` index makes concurrent logins of the same
+    device converge on a single document.
+    """
+    now = datetime.now()
+    device = {**device_info, "user_id": user_id, "updated_at": now}
+    filter = {"user_id": user_id, "device_id": device_info["device_id"]}
+    update = {"$set": device, "$setOnInsert": {"created_at": now}}
+
+    try:
+        return await db[DEVICES_COLLECTION].update_one(filter, update, upsert=True)
+    except DuplicateKeyError:
+        # Lost the insert race to a concurrent login; the document exists now.
+        return await db[DEVICES_COLLECTION].update_one(filter, update)
+
+
+async def find_device_account(db, user_id: UUID, device_id: str):
+    """
+    Return the account projection of `user_id` if `device_id` is registered
+    for it, in a single aggregate from `devices`.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id, "device_id": device_id}},
+        {"$limit": 1},
+        {
+            "$lookup": {
+                "from": "accounts",
+                "localField": "user_id",
+                "foreignField": "user_id",
+                "as": "account",
+                "pipeline": [{"$project": ACCOUNT_PROJECTION}],
+            }
+        },
+        {"$unwind": "$account"},
+        {"$replaceRoot": {"newRoot": "$account"}},
+    ]
+    async for account in db[DEVICES_COLLECTION].aggregate(pipeline):
+        return account
+    return None
@@ -0,0 +1,152 @@
+"""
+Declarative index registry.
+
+Every collection lists the indexes its hot queries depend on. The registry
+is applied idempotently from `main.lifespan` and can be run by hand:
+
+    python -m db.indexes apply
+    python -m db.indexes report
+"""
+
+import sys
+import asyncio
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import OperationFailure
+from db.db_connection import MongoClientRegistry
+
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "accounts": [
+        # `register_user` relies on these to raise DuplicateKeyError.
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("mobile_no", ASCENDING)], name="mobile_no_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "devices": [
+        IndexModel(
+            [("user_id", ASCENDING), ("device_id", ASCENDING)],
+            name="user_device_unique",
+            unique=True,
+        ),
+    ],
+    "chat_room": [
+        IndexModel([("room_id", ASCENDING)], name="room_id_unique", unique=True),
+    ],
+    "read_watermarks": [
+        # Serves the receipt upsert and the per-room load through its prefix.
+        IndexModel(
+            [("room_id", ASCENDING), ("user_id", ASCENDING)],
+            name="room_user_unique",
+            unique=True,
+        ),
+    ],
+    "user_messages": [
+        # Also serves plain `room_id` lookups through its prefix.
+        IndexModel(
+            [("room_id", ASCENDING), ("sent_at", ASCENDING), ("message_id", ASCENDING)],
+            name="room_history",
+        ),
+        # Resolves read receipts that name a message.
+        IndexModel(
+            [("room_id", ASCENDING), ("message_id", ASCENDING)],
+            name="room_message",
+        ),
+    ],
+}
+
+
+class IndexCreationError(RuntimeError):
+    pass
+
+
+async def apply_indexes(db, registry: dict = INDEXES) -> dict:
+    """
+    Create every registered index. Existing indexes with the same
+    definition are left untouched, so this is safe on every startup.
+
+    Indexes are created one at a time so one failure, e.g. duplicates in
+    the data of a unique index, does not hold back the others. Returns per
+    collection the `created` index names and the `failed` ones with their
+    errors.
+    """
+    results = {}
+    for collection_name, index_models in registry.items():
+        result = results[collection_name] = {"created": [], "failed": {}}
+        for index_model in index_models:
+            name = index_model.document["name"]
+            try:
+                await db[collection_name].create_indexes([index_model])
+                result["created"].append(name)
+            except OperationFailure as e:
+                print(f"Failed to create index {collection_name}.{name}: {e}")
+                result["failed"][name] = str(e)
+    return results
+
+
+def require_unique_indexes(results: dict, registry: dict = INDEXES):
+    """
+    Raise `IndexCreationError` if a unique index failed: inserts and
+    upserts rely on them to reject duplicates.
+    """
+    failed = [
+        f"{collection_name}.{index_model.document['name']}"
+        for collection_name, index_models in registry.items()
+        for index_model in index_models
+        if index_model.document.get("unique")
+        and index_model.document["name"]
+        in results.get(collection_name, {}).get("failed", {})
+    ]
+    if failed:
+        raise IndexCreationError(
+            f"Unique indexes could not be created: {', '.join(failed)}"
+        )
+
+
+async def index_report(db, registry: dict = INDEXES) -> dict:
+    """
+    Compare registered indexes with `$indexStats` of every collection.
+
+    Returns per collection the registered indexes that are missing, the
+    existing ones that were never used since the server started and the
+    ones that exist but are not registered.
+    """
+    report = {}
+    for collection_name, index_models in registry.items():
+        registered = {model.document["name"] for model in index_models}
+        usage = {}
+        async for stats in db[collection_name].aggregate([{"$indexStats": {}}]):
+            usage[stats["name"]] = stats.get("accesses", {}).get("ops", 0)
+        usage.pop("_id_", None)
+
+        report[collection_name] = {
+            "missing": sorted(registered - set(usage)),
+            "unused": sorted(name for name, ops in usage.items() if not ops),
+            "unregistered": sorted(set(usage) - registered),
+            "usage": usage,
+        }
+    return report
+
+
+def print_index_report(report: dict):
+    for collection_name, info in report.items():
+        print(f"[indexes] {collection_name}: usage={info['usage']}")
+        if info["missing"]:
+            print(f"[indexes] {collection_name}: MISSING {info['missing']}")
+        if info["unused"]:
+            print(f"[indexes] {collection_name}: unused {info['unused']}")
+        if info["unregistered"]:
+            print(f"[indexes] {collection_name}: unregistered {info['unregistered']}")
+
+
+async def main(command: str):
+    db = MongoClientRegistry.get_database()
+    try:
+        if command == "apply":
+            print(await apply_indexes(db))
+        print_index_report(await index_report(db))
+    finally:
+        await MongoClientRegistry.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "report"))
@@ -0,0 +1,81 @@
+"""
+Move the embedded `accounts.device_info` arrays into the `devices`
+collection.
+
+    python -m db.migrate_devices          # copy devices
+    python -m db.migrate_devices --unset  # copy, then drop the arrays
+
+Safe to run more than once: devices are upserted on `(user_id, device_id)`.
+"""
+
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from db.db_connection import MongoClientRegistry
+from db.devices import DEVICES_COLLECTION
+from db.indexes import INDEXES, apply_indexes, require_unique_indexes
+
+
+async def migrate_devices(db, batch_size: int = 500, unset: bool = False) -> dict:
+    registry = {DEVICES_COLLECTION: INDEXES[DEVICES_COLLECTION]}
+    require_unique_indexes(await apply_indexes(db, registry), registry)
+
+    migrated_accounts = []
+    operations = []
+    upserted = 0
+    now = datetime.now()
+
+    async def write_batch():
+        nonlocal operations, upserted, migrated_accounts
+        if operations:
+            result = await db[DEVICES_COLLECTION].bulk_write(operations, ordered=False)
+            upserted += result.upserted_count + result.modified_count
+        if unset and migrated_accounts:
+            await db["accounts"].update_many(
+                {"_id": {"$in": migrated_accounts}}, {"$unset": {"device_info": ""}}
+            )
+        operations, migrated_accounts = [], []
+
+    cursor = db["accounts"].find(
+        {"device_info.0": {"$exists": True}},
+        {"_id": 1, "user_id": 1, "device_info": 1},
+        batch_size=batch_size,
+    )
+    async for account in cursor:
+        for device in account["device_info"]:
+            if not device.get("device_id"):
+                continue
+            operations.append(
+                UpdateOne(
+                    {"user_id": account["user_id"], "device_id": device["device_id"]},
+                    {
+                        # Never overwrite a device written by a newer login.
+                        "$setOnInsert": {
+                            **device,
+                            "user_id": account["user_id"],
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+        migrated_accounts.append(account["_id"])
+
+        if len(operations) >= batch_size:
+            await write_batch()
+
+    await write_batch()
+    return {"devices_written": upserted}
+
+
+async def main(unset: bool):
+    try:
+        print(await migrate_devices(MongoClientRegistry.get_database(), unset=unset))
+    finally:
+        await MongoClientRegistry.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(unset="--unset" in sys.argv[1:]))
@@ -0,0 +1,186 @@
+from uuid import UUID
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from redis.exceptions import WatchError
+from db.db_connection import MongoClientRegistry
+from db.redis.redis_connection import Redis
+from serializer.fast_json import dumps, loads
+from db.redis.recent_messages import recent_messages
+from db.write_behind import WriteBehindBuffer
+from utils.helpers import truncate_to_millis
+from utils import settings as st
+
+READ_WATERMARKS_COLLECTION = "read_watermarks"
+LOADED_FIELD = "__loaded"
+
+
+class ReadWatermarks:
+    """
+    Read state as one `read_at` watermark per `(user, room)`: everything
+    sent up to it counts as read. Marking any number of messages read is a
+    single `$max` upsert, so a watermark never moves backwards.
+
+    The watermarks of a room are cached in a Redis hash, user id to
+    watermark, that is filled from Mongo on the first read.
+    """
+
+    def __init__(self, ttl: int = 86400, prefix: str = "chat_room") -> None:
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def key(self, room_id: str) -> str:
+        return f"{self.prefix}:{room_id}:read"
+
+    async def mark_read(self, user_id: UUID, room_id: UUID, read_at: datetime) -> datetime:
+        """
+        Advance the watermark of `user_id` in `room_id` to `read_at` and
+        return the stored one, which is later if the user already read
+        further.
+        """
+        db = MongoClientRegistry.get_database()
+        filter = {"room_id": room_id, "user_id": user_id}
+        update = {"$max": {"read_at": read_at}, "$set": {"updated_at": datetime.now()}}
+        kwargs = {
+            "projection": {"_id": 0, "read_at": 1},
+            "return_document": ReturnDocument.AFTER,
+        }
+        try:
+            watermark = await db[READ_WATERMARKS_COLLECTION].find_one_and_update(
+                filter, update, upsert=True, **kwargs
+            )
+        except DuplicateKeyError:
+            # Lost the insert race to a concurrent receipt.
+            watermark = await db[READ_WATERMARKS_COLLECTION].find_one_and_update(
+                filter, update, **kwargs
+            )
+
+        read_at = watermark["read_at"]
+        await self._cache_max(str(room_id), str(user_id), dumps(read_at))
+        return read_at
+
+    async def _cache_max(self, room_id: str, user_id: str, value: bytes, retries: int = 3):
+        # Concurrent receipts may finish out of order; keep the latest.
+        key = self.key(room_id)
+        for _ in range(retries):
+            try:
+                async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                    await pipe.watch(key)
+                    current = await pipe.hget(key, user_id)
+                    if current is not None and current >= value:
+                        return
+                    pipe.multi()
+                    pipe.hset(key, user_id, value)
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                    return
+            except WatchError:
+                continue
+            except Exception as e:
+                print(f"Failed to cache read watermark: {e}")
+                return
+        # Still contended: drop the room's hash so the next read reloads it.
+        try:
+            await Redis.redis_client.delete(key)
+        except Exception as e:
+            print(f"Failed to drop cached watermarks: {e}")
+
+    async def room(self, room_id: UUID) -> dict:
+        """
+        Watermarks of every member who read something in the room, as ISO
+        strings keyed by user id.
+        """
+        key = self.key(str(room_id))
+        try:
+            cached = await Redis.redis_client.hgetall(key)
+        except Exception as e:
+            print(f"Failed to read cached watermarks: {e}")
+            cached = {}
+        if cached.pop(LOADED_FIELD.encode(), None) is not None:
+            return {user_id.decode(): loads(value) for user_id, value in cached.items()}
+
+        db = MongoClientRegistry.get_database()
+        watermarks = {}
+        cursor = db[READ_WATERMARKS_COLLECTION].find(
+            {"room_id": room_id}, {"_id": 0, "user_id": 1, "read_at": 1}
+        )
+        async for watermark in cursor:
+            watermarks[str(watermark["user_id"])] = dumps(watermark["read_at"])
+
+        try:
+            async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                # Receipts written meanwhile are newer than what was loaded.
+                for user_id, value in watermarks.items():
+                    pipe.hsetnx(key, user_id, value)
+                pipe.hset(key, LOADED_FIELD, 1)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to cache read watermarks: {e}")
+        return {user_id: loads(value) for user_id, value in watermarks.items()}
+
+
+async def resolve_read_at(
+    room_id: UUID,
+    read_at: datetime = None,
+    message_id: UUID = None,
+    message_buffer: WriteBehindBuffer = None,
+):
+    """
+    Watermark of a receipt: `read_at`, the `sent_at` of `message_id`, or
+    now. Returns None for an unknown message.
+
+    A message that is not written yet is found in this worker's
+    `message_buffer` or, when another worker holds it, in the room's
+    recent-messages list.
+    """
+    if read_at is not None:
+        return truncate_to_millis(read_at)
+    if message_id is None:
+        return truncate_to_millis(datetime.now())
+
+    filter = {"room_id": room_id, "message_id": message_id}
+    if message_buffer is not None:
+        message = message_buffer.find_pending(filter)
+        if message is not None:
+            return message["sent_at"]
+
+    db = MongoClientRegistry.get_database()
+    # Served by the `room_message` index.
+    message = await db["user_messages"].find_one(filter, {"_id": 0, "sent_at": 1})
+    if message is not None:
+        return message["sent_at"]
+
+    message = await recent_messages.find(str(room_id), str(message_id))
+    if message is not None:
+        return datetime.fromisoformat(message["sent_at"])
+    return None
+
+
+async def unread_after(
+    room_id: UUID,
+    user_id: UUID,
+    read_at: datetime,
+    message_buffer: WriteBehindBuffer = None,
+) -> int:
+    """
+    Number of messages of the room sent by others after `read_at`, with
+    the ones still in this worker's `message_buffer`. A read up to the
+    newest message matches nothing in the `room_history` index range.
+    """
+    db = MongoClientRegistry.get_database()
+    count = await db["user_messages"].count_documents(
+        {"room_id": room_id, "sent_at": {"$gt": read_at}, "sent_by": {"$ne": user_id}}
+    )
+    if message_buffer is not None:
+        count += sum(
+            1
+            for message in message_buffer.pending_documents()
+            if message["room_id"] == room_id
+            and message["sent_by"] != user_id
+            and message["sent_at"] > read_at
+        )
+    return count
+
+
+read_watermarks = ReadWatermarks(ttl=st.READ_WATERMARK_CACHE_TTL)
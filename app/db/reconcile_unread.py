@@ -0,0 +1,92 @@
+"""
+Rebuild the Redis unread counters from Mongo.
+
+    python -m db.reconcile_unread
+
+A member's count for a room is the number of messages sent by others
+after their read watermark. Counts are computed with one aggregate per
+room and the hashes of all users are replaced at the end, dropping those
+of users who are in no room; messages sent while the job runs may be
+counted twice or not at all until the next send or read.
+"""
+
+import asyncio
+from collections import defaultdict
+from db.db_connection import MongoClientRegistry
+from db.read_watermarks import READ_WATERMARKS_COLLECTION
+from db.redis.redis_connection import Redis
+from db.redis.unread_counters import unread_counters
+from utils import settings as st
+
+
+async def room_unread_counts(db, room: dict) -> dict:
+    """
+    Unread count of every member of one room, keyed by member id, with one
+    aggregate over the messages after the oldest watermark.
+    """
+    members = room.get("members") or []
+    if not members:
+        return {}
+
+    watermarks = {}
+    cursor = db[READ_WATERMARKS_COLLECTION].find(
+        {"room_id": room["room_id"]}, {"_id": 0, "user_id": 1, "read_at": 1}
+    )
+    async for watermark in cursor:
+        watermarks[watermark["user_id"]] = watermark["read_at"]
+
+    match = {"room_id": room["room_id"]}
+    if all(member in watermarks for member in members):
+        # Served by the `room_history` index.
+        match["sent_at"] = {"$gt": min(watermarks[member] for member in members)}
+
+    group = {"_id": None}
+    for index, member in enumerate(members):
+        unread = {"$ne": ["$sent_by", member]}
+        if member in watermarks:
+            unread = {"$and": [unread, {"$gt": ["$sent_at", watermarks[member]]}]}
+        group[f"member_{index}"] = {"$sum": {"$cond": [unread, 1, 0]}}
+
+    results = await db["user_messages"].aggregate(
+        [{"$match": match}, {"$group": group}]
+    ).to_list(1)
+    result = results[0] if results else {}
+    return {
+        member: result.get(f"member_{index}", 0)
+        for index, member in enumerate(members)
+    }
+
+
+async def reconcile_unread(db, batch_size: int = 500) -> dict:
+    counters = defaultdict(dict)
+    rooms = 0
+    cursor = db["chat_room"].find(
+        {}, {"_id": 0, "room_id": 1, "members": 1}, batch_size=batch_size
+    )
+    async for room in cursor:
+        for member, count in (await room_unread_counts(db, room)).items():
+            counters[member][room["room_id"]] = count
+        rooms += 1
+
+    await unread_counters.replace_many(counters)
+    # Users who are in no room any more still have a hash from earlier sends.
+    stale = await unread_counters.delete_except(counters)
+    return {
+        "rooms": rooms,
+        "users": len(counters),
+        "stale_users": stale,
+        "unread": sum(sum(counts.values()) for counts in counters.values()),
+    }
+
+
+async def main():
+    await Redis.connect(host=st.HOST, port=st.PORT)
+    try:
+        print(await reconcile_unread(MongoClientRegistry.get_database()))
+    finally:
+        await MongoClientRegistry.close()
+        await Redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
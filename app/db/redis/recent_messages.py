@@ -0,0 +1,130 @@
+from serializer.fast_json import dumps, loads
+from redis.exceptions import WatchError
+from db.redis.redis_connection import Redis
+from utils import settings as st
+
+
+class RecentMessages:
+    """
+    Per-room capped Redis list with the newest `size` serialized messages,
+    newest first.
+
+    The WebSocket send path appends to it, and the first pages of history
+    are read from it. A room's list is only trusted after it was hydrated
+    from Mongo, which is recorded by a `complete` marker key.
+    """
+
+    def __init__(
+        self, size: int = 200, ttl: int = 86400, prefix: str = "chat_room"
+    ) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def key(self, room_id: str) -> str:
+        return f"{self.prefix}:{room_id}:recent"
+
+    def complete_key(self, room_id: str) -> str:
+        return f"{self.prefix}:{room_id}:recent:complete"
+
+    async def append(self, room_id: str, message: dict):
+        await self.append_many(room_id, [message])
+
+    async def append_many(self, room_id: str, messages: list):
+        """
+        Push messages, given oldest first, in one round trip.
+        """
+        key, complete_key = self.key(room_id), self.complete_key(room_id)
+        try:
+            async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                pipe.lpush(key, *(dumps(message) for message in messages))
+                pipe.ltrim(key, 0, self.size - 1)
+                pipe.expire(key, self.ttl)
+                pipe.expire(complete_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to append recent message: {e}")
+
+    def covers(self, page: int, size: int) -> bool:
+        return page >= 1 and page * size <= self.size
+
+    async def page(self, room_id: str, page: int = 1, size: int = 50):
+        """
+        Return one newest-first page, or None when the page has to be read
+        from Mongo (list not hydrated or page beyond the cap).
+        """
+        if not self.covers(page, size):
+            return None
+
+        start = (page - 1) * size
+        try:
+            async with Redis.redis_client.pipeline(transaction=False) as pipe:
+                pipe.exists(self.complete_key(room_id))
+                pipe.lrange(self.key(room_id), start, start + size - 1)
+                is_complete, items = await pipe.execute()
+        except Exception as e:
+            print(f"Failed to read recent messages: {e}")
+            return None
+
+        if not is_complete:
+            return None
+        return [loads(item) for item in items]
+
+    async def find(self, room_id: str, message_id: str):
+        """
+        Return a listed message by id, hydrated or not, or None.
+        """
+        try:
+            items = await Redis.redis_client.lrange(self.key(room_id), 0, -1)
+        except Exception as e:
+            print(f"Failed to read recent messages: {e}")
+            return None
+        for item in items:
+            message = loads(item)
+            if message["message_id"] == message_id:
+                return message
+        return None
+
+    async def hydrate(self, room_id: str, messages: list) -> bool:
+        """
+        Fill the list from the newest-first `messages` read from Mongo,
+        merged with whatever the send path appended meanwhile. Gives up if
+        the list changes during the merge; the next read retries.
+        """
+        key = self.key(room_id)
+        try:
+            async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                appended = [loads(item) for item in await pipe.lrange(key, 0, -1)]
+
+                # Bring Mongo documents to the stored form (string ids and dates).
+                merged = {
+                    message["message_id"]: message
+                    for message in loads(dumps(messages))
+                }
+                merged.update((message["message_id"], message) for message in appended)
+                newest_first = sorted(
+                    merged.values(),
+                    key=lambda message: (message["sent_at"], message["message_id"]),
+                    reverse=True,
+                )[: self.size]
+
+                pipe.multi()
+                pipe.delete(key)
+                if newest_first:
+                    pipe.rpush(key, *(dumps(item) for item in newest_first))
+                    pipe.expire(key, self.ttl)
+                pipe.set(self.complete_key(room_id), 1, ex=self.ttl)
+                await pipe.execute()
+            return True
+
+        except WatchError:
+            return False
+        except Exception as e:
+            print(f"Failed to hydrate recent messages: {e}")
+            return False
+
+
+recent_messages = RecentMessages(
+    size=st.RECENT_MESSAGES_SIZE, ttl=st.RECENT_MESSAGES_TTL
+)
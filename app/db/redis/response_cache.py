@@ -0,0 +1,102 @@
+import hashlib
+from uuid import uuid4
+from redis.exceptions import WatchError
+from db.redis.redis_connection import Redis
+from utils import settings as st
+
+GENERATION_FIELD = "__generation"
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches `etag` (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class ResponseCache:
+    """
+    Rendered response bodies of one room, in a Redis hash keyed by the
+    request's query. A field holds `etag\\nbody`, so a hit is a single
+    HMGET that is written back without decoding.
+
+    Any change to the room replaces the hash with a fresh generation
+    token. A body is only stored if the generation it was rendered under
+    is still current, so a page rendered before a new message never lands
+    in the cache after it.
+    """
+
+    def __init__(self, ttl: int = 300, prefix: str = "chat_room") -> None:
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def key(self, room_id: str) -> str:
+        return f"{self.prefix}:{room_id}:pages"
+
+    async def get(self, room_id: str, field: str):
+        """
+        Return `(etag, body, generation)`. `etag` and `body` are None on a
+        miss; pass `generation` back to `set`.
+        """
+        try:
+            value, generation = await Redis.redis_client.hmget(
+                self.key(room_id), field, GENERATION_FIELD
+            )
+        except Exception as e:
+            print(f"Failed to read cached response: {e}")
+            return None, None, False
+
+        if value is None:
+            return None, None, generation
+        etag, _, body = value.partition(b"\n")
+        return etag.decode(), body, generation
+
+    async def set(self, room_id: str, field: str, body: bytes, generation) -> str:
+        """
+        Store a rendered body and return its ETag. Skipped if the room
+        changed since `generation` was read.
+        """
+        etag = make_etag(body)
+        if generation is False:
+            return etag
+
+        key = self.key(room_id)
+        try:
+            async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                if await pipe.hget(key, GENERATION_FIELD) != generation:
+                    return etag
+                pipe.multi()
+                pipe.hset(key, field, etag.encode() + b"\n" + body)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except WatchError:
+            pass
+        except Exception as e:
+            print(f"Failed to cache response: {e}")
+        return etag
+
+    async def invalidate(self, room_id: str):
+        key = self.key(room_id)
+        try:
+            async with Redis.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, GENERATION_FIELD, uuid4().hex)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to invalidate cached responses: {e}")
+
+
+chat_list_cache = ResponseCache(ttl=st.CHAT_LIST_CACHE_TTL)
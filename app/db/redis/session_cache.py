@@ -0,0 +1,132 @@
+from bson import json_util
+from bson.binary import UuidRepresentation
+from db.redis.redis_connection import Redis
+from utils.cache import TTLCache
+from utils import settings as st
+
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(
+    uuid_representation=UuidRepresentation.STANDARD
+)
+
+# Account fields needed by authenticated handlers. Secrets stay out of the cache.
+ACCOUNT_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "name": 1,
+    "email": 1,
+    "mobile_no": 1,
+    "is_activated": 1,
+    "is_email_verified": 1,
+    "contacts_info": 1,
+}
+
+
+class SessionCache:
+    """
+    Two-tier cache of validated sessions used by `is_authenticated_user`.
+
+    Entries are keyed by `(device_id, user_id, random_device_uuid)` and hold
+    the account projection together with the expected device identity
+    hash. The in-process tier has a short TTL so an invalidation made by
+    another worker is picked up quickly; Redis is shared by all workers.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        local_ttl: float = 15,
+        redis_ttl: int = 900,
+        prefix: str = "session",
+    ) -> None:
+        self.local = TTLCache(max_size=max_size, ttl=local_ttl)
+        self.redis_ttl = redis_ttl
+        self.prefix = prefix
+
+    def redis_key(self, device_id: str, user_id: str, random_device_uuid: str) -> str:
+        return f"{self.prefix}:{device_id}:{user_id}:{random_device_uuid}"
+
+    def index_key(self, kind: str, value: str) -> str:
+        return f"{self.prefix}_keys:{kind}:{value}"
+
+    async def get(self, device_id: str, user_id: str, random_device_uuid: str):
+        """
+        Return `(account, device_hash)` or None on a miss.
+        """
+        key = (device_id, user_id, random_device_uuid)
+        session = self.local.get(key)
+
+        if session is None:
+            try:
+                value = await Redis.redis_client.get(self.redis_key(*key))
+            except Exception as e:
+                print(f"Session cache read failed: {e}")
+                return None
+            if value is None:
+                return None
+            session = json_util.loads(value, json_options=JSON_OPTIONS)
+            self.local.set(key, session)
+
+        return dict(session["account"]), session["device_hash"]
+
+    async def set(
+        self,
+        device_id: str,
+        user_id: str,
+        random_device_uuid: str,
+        account: dict,
+        device_hash: str,
+    ):
+        key = (device_id, user_id, random_device_uuid)
+        account = {
+            field: account[field] for field in ACCOUNT_PROJECTION if field in account
+        }
+        session = {"account": account, "device_hash": device_hash}
+        self.local.set(key, session)
+
+        redis_key = self.redis_key(*key)
+        try:
+            async with Redis.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    redis_key,
+                    json_util.dumps(session, json_options=JSON_OPTIONS),
+                    ex=self.redis_ttl,
+                )
+                for index_key in (
+                    self.index_key("device", device_id),
+                    self.index_key("user", user_id),
+                ):
+                    pipe.sadd(index_key, redis_key)
+                    pipe.expire(index_key, self.redis_ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Session cache write failed: {e}")
+
+    async def _invalidate(self, kind: str, value: str, position: int):
+        self.local.pop_where(lambda key: key[position] == value)
+
+        index_key = self.index_key(kind, value)
+        try:
+            keys = await Redis.redis_client.smembers(index_key)
+            await Redis.redis_client.delete(index_key, *keys)
+        except Exception as e:
+            print(f"Session cache invalidation failed: {e}")
+
+    async def invalidate_device(self, device_id: str):
+        """
+        Drop every session of a device, e.g. when it logs in again.
+        """
+        await self._invalidate("device", device_id, position=0)
+
+    async def invalidate_user(self, user_id):
+        """
+        Drop every session of an account, e.g. after it is deactivated,
+        its email is re-verified or its contacts change.
+        """
+        await self._invalidate("user", str(user_id), position=1)
+
+
+session_cache = SessionCache(
+    max_size=st.SESSION_CACHE_SIZE,
+    local_ttl=st.SESSION_CACHE_LOCAL_TTL,
+    redis_ttl=st.SESSION_CACHE_TTL,
+)
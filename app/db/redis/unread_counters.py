@@ -0,0 +1,88 @@
+from uuid import UUID
+from db.redis.redis_connection import Redis
+
+
+class UnreadCounters:
+    """
+    Unread message counts kept incrementally in one Redis hash per user,
+    room id to count. The send path increments them for every member but
+    the sender, a read sets the room to what is left after the new
+    watermark, and all badges of a user are one HGETALL.
+
+    Counters drift if a write is lost; `db.reconcile_unread` rebuilds them
+    from Mongo.
+    """
+
+    def __init__(self, prefix: str = "unread") -> None:
+        self.prefix = prefix
+
+    def key(self, user_id) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def increment(self, room_id: UUID, recipients, count: int = 1):
+        """
+        Add `count` to the room's counter of every recipient, in one round
+        trip.
+        """
+        recipients = list(recipients)
+        if not recipients or count <= 0:
+            return
+        try:
+            async with Redis.redis_client.pipeline(transaction=False) as pipe:
+                for user_id in recipients:
+                    pipe.hincrby(self.key(user_id), str(room_id), count)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to increment unread counters: {e}")
+
+    async def set(self, user_id: UUID, room_id: UUID, count: int):
+        try:
+            if count > 0:
+                await Redis.redis_client.hset(self.key(user_id), str(room_id), count)
+            else:
+                await Redis.redis_client.hdel(self.key(user_id), str(room_id))
+        except Exception as e:
+            print(f"Failed to set unread counter: {e}")
+
+    async def counts(self, user_id: UUID) -> dict:
+        """
+        Unread count of every room with unread messages, keyed by room id.
+        """
+        counters = await Redis.redis_client.hgetall(self.key(user_id))
+        return {
+            room_id.decode(): int(count)
+            for room_id, count in counters.items()
+            if int(count) > 0
+        }
+
+    async def replace_many(self, counters: dict):
+        """
+        Overwrite the whole hash of each user in `counters`, user id to
+        `{room_id: count}`, in one transaction.
+        """
+        async with Redis.redis_client.pipeline(transaction=True) as pipe:
+            for user_id, rooms in counters.items():
+                key = self.key(user_id)
+                pipe.delete(key)
+                rooms = {str(room_id): count for room_id, count in rooms.items() if count}
+                if rooms:
+                    pipe.hset(key, mapping=rooms)
+            await pipe.execute()
+
+    async def delete_except(self, user_ids) -> int:
+        """
+        Drop the hashes of users not in `user_ids`, e.g. users who left
+        every room. Returns how many were dropped.
+        """
+        keep = {self.key(user_id).encode() for user_id in user_ids}
+        stale = [
+            key
+            async for key in Redis.redis_client.scan_iter(match=f"{self.prefix}:*")
+            if key not in keep
+        ]
+        if stale:
+            await Redis.redis_client.delete(*stale)
+        return len(stale)
+
+
+unread_counters = UnreadCounters()
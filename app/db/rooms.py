@@ -0,0 +1,42 @@
+from uuid import UUID
+from utils.helpers import generate_room_id
+
+ROOMS_COLLECTION = "chat_room"
+
+
+def room_uuid(members: list) -> UUID:
+    """
+    Deterministic room id of a member list, the same for any order of
+    the members.
+    """
+    return UUID(generate_room_id(members)[:32])
+
+
+async def find_missing_accounts(db, user_ids) -> set:
+    """
+    Return the ids in `user_ids` that have no account, using one `$in`
+    query instead of a lookup per user.
+    """
+    wanted = set(user_ids)
+    if not wanted:
+        return set()
+    found = set()
+    cursor = db["accounts"].find(
+        {"user_id": {"$in": list(wanted)}}, {"_id": 0, "user_id": 1}
+    )
+    async for account in cursor:
+        found.add(account["user_id"])
+    return wanted - found
+
+
+async def find_rooms(db, room_ids: list) -> dict:
+    """
+    Map each existing room id of `room_ids` to its member list.
+    """
+    rooms = {}
+    cursor = db[ROOMS_COLLECTION].find(
+        {"room_id": {"$in": room_ids}}, {"_id": 0, "room_id": 1, "members": 1}
+    )
+    async for room in cursor:
+        rooms[room["room_id"]] = room.get("members", [])
+    return rooms
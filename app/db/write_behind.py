@@ -0,0 +1,181 @@
+import asyncio
+from pymongo.errors import BulkWriteError
+from db.db_connection import MongoClientRegistry
+
+
+class DurabilityMode:
+    # `enqueue` returns as soon as the document is buffered.
+    ENQUEUE = "enqueue"
+    # `flush` returns once the batch holding the document is written.
+    FLUSH = "flush"
+
+
+class WriteBehindBuffer:
+    """
+    Per-worker write-behind buffer for one collection.
+
+    Documents are buffered in memory and written with
+    `insert_many(ordered=False)`. A document arriving while no write is in
+    flight is written right away, so a quiet collection pays one insert
+    round trip; documents arriving during a write are batched into the
+    next one, up to `batch_size`. `flush_interval` only bounds how long a
+    document waits if the flush task misses a wake-up.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000,
+        durability: str = DurabilityMode.FLUSH,
+    ) -> None:
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.durability = durability
+        self.db = None
+        self.buffer: list = []
+        # Batch being written; not yet visible in Mongo.
+        self.writing: list = []
+        self.flush_lock = asyncio.Lock()
+        self.batch_ready = asyncio.Event()
+        self.task: asyncio.Task = None
+        self.stopping = False
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def start(self, db=None):
+        self.db = db if db is not None else MongoClientRegistry.get_database()
+        self.stopping = False
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the flush task and write everything still pending.
+        """
+        if self.task is not None:
+            # Let the flush task finish its current batch and exit.
+            self.stopping = True
+            self.batch_ready.set()
+            await self.task
+            self.task = None
+        await self.flush()
+
+    async def enqueue(self, document: dict) -> bool:
+        return (await self.enqueue_many([document]))[0]
+
+    async def enqueue_many(self, documents: list) -> list:
+        """
+        Buffer documents together, so documents that arrived together are
+        written in the same batch when they fit.
+
+        Returns whether each document was written. With `enqueue`
+        durability that is not known yet: every document counts as written
+        and a later failure is only logged.
+        """
+        waiters = []
+        wait = self.durability == DurabilityMode.FLUSH or self.task is None
+        for document in documents:
+            waiter = asyncio.get_running_loop().create_future() if wait else None
+            self.buffer.append((document, waiter))
+            if waiter is not None:
+                waiters.append(waiter)
+
+        if len(self.buffer) >= self.batch_size or not self.flush_lock.locked():
+            # A write in flight picks up what arrives meanwhile when it ends.
+            self.batch_ready.set()
+
+        if self.task is None or len(self.buffer) >= self.max_pending:
+            # Not started (scripts) or too far behind: write inline.
+            await self.flush()
+
+        if not waiters:
+            return [True] * len(documents)
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return [result is True for result in results]
+
+    async def flush(self):
+        async with self.flush_lock:
+            while self.buffer:
+                batch = self.buffer[: self.batch_size]
+                self.buffer = self.buffer[self.batch_size :]
+                self.writing = batch
+                try:
+                    await self._write(batch)
+                finally:
+                    self.writing = []
+            self.batch_ready.clear()
+
+    async def _write(self, batch: list):
+        if self.db is None:
+            self.db = MongoClientRegistry.get_database()
+
+        failed_indexes = {}
+        try:
+            await self.db[self.collection_name].insert_many(
+                [document for document, _ in batch], ordered=False
+            )
+        except BulkWriteError as bwe:
+            for error in bwe.details.get("writeErrors", []):
+                failed_indexes[error["index"]] = error.get("errmsg", "write error")
+        except Exception as e:
+            failed_indexes = {index: str(e) for index in range(len(batch))}
+
+        self.batches += 1
+        self.failed += len(failed_indexes)
+        self.flushed += len(batch) - len(failed_indexes)
+        for index, (_, waiter) in enumerate(batch):
+            if waiter is None or waiter.done():
+                continue
+            if index in failed_indexes:
+                waiter.set_exception(RuntimeError(failed_indexes[index]))
+            else:
+                waiter.set_result(True)
+
+        if failed_indexes:
+            print(
+                f"Failed to write {len(failed_indexes)} of {len(batch)} documents into {self.collection_name}."
+            )
+
+    async def _run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(
+                    self.batch_ready.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+
+    def pending_documents(self) -> list:
+        """
+        Buffered and in-flight documents, which Mongo cannot see yet.
+        """
+        return [document for document, _ in self.writing + self.buffer]
+
+    def find_pending(self, filter: dict):
+        """
+        Return a pending document whose fields equal those of `filter`, or
+        None.
+        """
+        for document in self.pending_documents():
+            if all(document.get(field) == value for field, value in filter.items()):
+                return document
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "durability": self.durability,
+            "pending": len(self.buffer),
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
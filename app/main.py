@@ -2,28 +2,54 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from middleware import apply_cors_middleware
 from absolute_url import get_absolute_url
-from db.db_connection import MongoDBConnection
+from db.db_connection import MongoClientRegistry
+from db.indexes import (
+    apply_indexes,
+    require_unique_indexes,
+    index_report,
+    print_index_report,
+)
 from db.redis.redis_connection import Redis
+from sockets import connection_manager, chat_manager
+from utils.executors import cpu_executor
+from utils.mail_queue import mail_queue
+from utils.emails import EmailTemplateRegistry
+from serializer.fast_json import FastJSONResponse
 from utils import settings as st
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    mongo_connection = MongoDBConnection(db_name="leoDB")
-    app.db = await mongo_connection.db_connection()
-    app.db_uri = await mongo_connection.db_uri()
+    app.mongo_client = MongoClientRegistry.connect(db_name=st.MONGO_DB_NAME)
+    app.db = MongoClientRegistry.get_database()
+    # Refuse to serve without the unique indexes registration relies on.
+    require_unique_indexes(await apply_indexes(app.db))
+    try:
+        # Diagnostics only; `$indexStats` may be unsupported or not permitted.
+        print_index_report(await index_report(app.db))
+    except Exception as e:
+        print(f"Skipped index report: {e}")
     app.redis=await Redis.connect(host=st.HOST, port=st.PORT)
+    await connection_manager.start()
+    await chat_manager.start()
+    cpu_executor.start()
+    EmailTemplateRegistry.load()
+    await mail_queue.start()
     yield
     
     # release the resources
+    await connection_manager.stop()
+    await chat_manager.stop()
+    await mail_queue.stop()
+    cpu_executor.shutdown()
     await Redis.close()
-    await mongo_connection.close()
+    await MongoClientRegistry.close()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 app = apply_cors_middleware(app)  # Middlewares...
 app = get_absolute_url(app=app)  # Routes
 
 # App root
 @app.get('/', tags=['Root'])
 async def root():
-    return {'message': 'Welcome to this fantastic LeoChat app! Just enjoy this app...!'}
\ No newline at end of file
+    return {'message': 'Welcome to this fantastic LeoChat app! Just enjoy this app...!'}
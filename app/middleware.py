@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import HTTPException
-from fastapi.responses import JSONResponse
+from serializer.fast_json import FastJSONResponse
 from utils.helpers import get_payload
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
@@ -23,7 +23,7 @@ def apply_cors_middleware(app: FastAPI):
     async def http_exception_handler(request, exc: HTTPException):
 
         try:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=exc.status_code,
                 content=get_payload(
                     message=str(exc.detail["message"]),
@@ -35,7 +35,7 @@ def apply_cors_middleware(app: FastAPI):
         except Exception as e:
             print("ERROR: ", e)
             # print("New Error Occurse: ", e.__class__.__class__)
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=exc.status_code,
                 content=get_payload(
                     message="Token not provided.",
@@ -66,7 +66,7 @@ def apply_cors_middleware(app: FastAPI):
                 f"{errors[0].get('loc')}, {errors[0].get('msg')}" if errors else errors
             )
         # Return the JSON response
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status_code,
             content=get_payload(
                 message=error_message, is_authenticated=False, ok=False
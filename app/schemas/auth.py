@@ -148,4 +148,8 @@ class ContactsNo(BaseModel):
     name: str
     email: str=None
     contact_no: str
-    has_account: bool=False
\ No newline at end of file
+    has_account: bool=False
+
+
+class ContactsSync(BaseModel):
+    contacts: list[ContactsNo] = Field(..., max_length=10000)
@@ -11,6 +11,14 @@ class ChatRoom(BaseModel):
     description: Optional[str]=Field(default=None)
     members: list[str]  # User IDs
 
+class BulkChatRooms(BaseModel):
+    rooms: list[ChatRoom] = Field(..., min_length=1, max_length=1000)
+
+class ReadReceipt(BaseModel):
+    # Mark read up to this time, or up to `message_id`; defaults to now.
+    read_at: Optional[datetime] = None
+    message_id: Optional[UUID] = None
+
 class MessageModel(BaseModel):
     message_id: UUID = Field(default_factory=uuid4)  # Auto-generate UUID
     room_id: UUID=Field(default_factory=uuid4)
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of the response encoding path.
+
+Compares the previous path (`MongoEncoder.serialize_list` converting every
+field in Python, then stdlib `json.dumps` through `JSONResponse`) with
+`FastJSONResponse` encoding the raw documents.
+
+    python -m serializer.benchmark
+    python -m serializer.benchmark --size 1000 --rounds 200
+"""
+
+import sys
+import time
+import asyncio
+from uuid import uuid4
+from datetime import datetime
+from fastapi.responses import JSONResponse
+from serializer.data_serializer import MongoEncoder
+from serializer.fast_json import FastJSONResponse
+from utils.helpers import get_payload
+
+
+def history_page(size: int) -> list:
+    return [
+        {
+            "message_id": uuid4(),
+            "message": f"Message number {index} of the benchmark page.",
+            "is_read": index % 2 == 0,
+            "sent_at": datetime.now(),
+            "sent_by": "johndoe@example.com",
+        }
+        for index in range(size)
+    ]
+
+
+async def cursor(documents: list):
+    for document in documents:
+        # A cursor hands out fresh documents every time.
+        yield dict(document)
+
+
+async def stdlib_path(documents: list) -> bytes:
+    serialized = await MongoEncoder.serialize_list(cursor(documents))
+    return JSONResponse(content=get_payload(details=serialized, ok=True)).body
+
+
+async def fast_path(documents: list) -> bytes:
+    history = [document async for document in cursor(documents)]
+    return FastJSONResponse(content=get_payload(details=history, ok=True)).body
+
+
+async def measure(path, documents: list, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await path(documents)
+    return (time.perf_counter() - started) / rounds
+
+
+async def main(size: int, rounds: int):
+    documents = history_page(size)
+    results = {}
+    for name, path in (("json + MongoEncoder", stdlib_path), ("orjson", fast_path)):
+        await path(documents)  # warm up
+        results[name] = await measure(path, documents, rounds)
+
+    baseline = results["json + MongoEncoder"]
+    print(f"{size} documents, {rounds} rounds")
+    for name, seconds in results.items():
+        print(f"{name:>20}: {seconds * 1000:8.3f} ms/response  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    size = int(args[args.index("--size") + 1]) if "--size" in args else 50
+    rounds = int(args[args.index("--rounds") + 1]) if "--rounds" in args else 1000
+    asyncio.run(main(size, rounds))
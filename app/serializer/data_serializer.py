@@ -4,24 +4,43 @@ from uuid import UUID
 
 # Helper to serialize ObjectId
 class MongoEncoder:
+    """
+    Converts Mongo documents to plain JSON types in Python. Responses do not
+    need it, `serializer.fast_json` encodes these types natively.
+    """
 
     @staticmethod
     async def serialize_list(item):
-        """Recursively convert MongoDB documents to JSON serializable format."""
+        """Convert every document of an async cursor to JSON serializable format."""
 
         item_ls = []
         async for data in item:
-            for key, value in data.items():
-                if isinstance(value, datetime):
-                    data[key] = value.isoformat()
-                if isinstance(value, UUID):
-                    data[key] = str(value)
-            item_ls.append(data)
+            item_ls.append(MongoEncoder.serialize_document(data))
         return item_ls
 
+    @staticmethod
+    def serialize_document(data):
+        """Convert the datetime and UUID fields of one document in place."""
+        for key, value in data.items():
+            if isinstance(value, datetime):
+                data[key] = value.isoformat()
+            if isinstance(value, UUID):
+                data[key] = str(value)
+        return data
+
     @staticmethod
     async def serialize_dict(data):
         """Recursively convert MongoDB documents to JSON serializable format."""
-        return {
-            key: await MongoEncoder.serialize_dict(value) for key, value in data.items()
-        }
+        return MongoEncoder.serialize_value(data)
+
+    @staticmethod
+    def serialize_value(value):
+        if isinstance(value, dict):
+            return {key: MongoEncoder.serialize_value(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [MongoEncoder.serialize_value(item) for item in value]
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (UUID, ObjectId)):
+            return str(value)
+        return value
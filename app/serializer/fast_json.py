@@ -0,0 +1,51 @@
+import base64
+import orjson
+from typing import Any
+from bson import Binary, ObjectId, UuidRepresentation
+from bson.binary import UUID_SUBTYPE, OLD_UUID_SUBTYPE
+from fastapi.responses import JSONResponse
+
+# Dict keys that are not strings (e.g. UUIDs) are stringified as well.
+DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    """
+    Types orjson does not know. `UUID` and `datetime` never get here, orjson
+    writes them natively (`str(uuid)` and `isoformat()`).
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Binary):
+        if value.subtype == UUID_SUBTYPE:
+            return str(value.as_uuid(UuidRepresentation.STANDARD))
+        if value.subtype == OLD_UUID_SUBTYPE:
+            return str(value.as_uuid(UuidRepresentation.PYTHON_LEGACY))
+        return base64.b64encode(value).decode()
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode Mongo documents, and anything nested in them, in one pass.
+    """
+    return orjson.dumps(content, default=_default, option=DUMPS_OPTIONS)
+
+
+def loads(data):
+    return orjson.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    `JSONResponse` encoding with orjson, so handlers can return raw Mongo
+    documents without converting UUID, datetime, ObjectId or Binary fields
+    first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
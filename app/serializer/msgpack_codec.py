@@ -0,0 +1,42 @@
+import msgpack
+from uuid import UUID
+from datetime import datetime, timezone
+from bson import ObjectId
+
+# Application ext type carrying the 16 raw bytes of a UUID.
+UUID_EXT_TYPE = 1
+
+
+def _default(value):
+    if isinstance(value, UUID):
+        return msgpack.ExtType(UUID_EXT_TYPE, value.bytes)
+    if isinstance(value, datetime):
+        # Naive datetimes are local time, like everywhere else in Python.
+        return msgpack.Timestamp.from_datetime(value.astimezone(timezone.utc))
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not MessagePack serializable: {type(value).__name__}")
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == UUID_EXT_TYPE:
+        return UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+def pack(content) -> bytes:
+    """
+    MessagePack with UUIDs as ext type 1 and datetimes as the standard
+    timestamp ext type (-1).
+    """
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def unpack(data: bytes):
+    """
+    Decode `pack` output. Timestamps become aware UTC datetimes; an aware
+    datetime round-trips to the same instant.
+    """
+    return msgpack.unpackb(data, ext_hook=_ext_hook, timestamp=3, raw=False)
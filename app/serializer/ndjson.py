@@ -0,0 +1,35 @@
+import zlib
+from typing import AsyncIterator
+from serializer.fast_json import dumps
+
+
+async def stream_ndjson(
+    documents: AsyncIterator[dict], compress: bool = False, chunk_size: int = 65536
+):
+    """
+    Encode documents as newline-delimited JSON, optionally gzip-compressed.
+
+    Lines are grouped into chunks of about `chunk_size` bytes. The first
+    document is sent on its own so the client gets bytes right away.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    buffered = 0
+    first = True
+
+    async for document in documents:
+        buffer.append(dumps(document) + b"\n")
+        buffered += len(buffer[-1])
+        if first or buffered >= chunk_size:
+            chunk = b"".join(buffer)
+            if compressor is not None:
+                # Sync-flush so every chunk leaves the compressor at once.
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield chunk
+            buffer, buffered, first = [], 0, False
+
+    chunk = b"".join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
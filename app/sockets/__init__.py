@@ -1,4 +1,23 @@
 from sockets.connection_manager import ConnectionManager, Chatmanager
+from sockets.pubsub import RoomBroadcaster
+from sockets.room_membership import RoomMembershipCache
+from db.write_behind import WriteBehindBuffer
+from utils import settings as st
 
-connection_manager = ConnectionManager()
-chat_manager = Chatmanager()
\ No newline at end of file
+connection_manager = ConnectionManager(
+    broadcaster=RoomBroadcaster() if st.WS_BROADCAST_MODE == "redis" else None,
+    max_queue_size=st.WS_SEND_QUEUE_SIZE,
+    overflow_policy=st.WS_OVERFLOW_POLICY,
+    coalesce_window=st.WS_COALESCE_WINDOW_MS / 1000,
+)
+chat_manager = Chatmanager(
+    message_buffer=WriteBehindBuffer(
+        collection_name="user_messages",
+        batch_size=st.MESSAGE_BATCH_SIZE,
+        flush_interval=st.MESSAGE_FLUSH_INTERVAL,
+        durability=st.MESSAGE_DURABILITY,
+    )
+)
+room_membership = RoomMembershipCache(
+    max_size=st.ROOM_MEMBERSHIP_CACHE_SIZE, ttl=st.ROOM_MEMBERSHIP_CACHE_TTL
+)
\ No newline at end of file
@@ -1,19 +1,68 @@
-from db.db_connection import get_database 
+import asyncio
+from db.db_connection import get_database
 from fastapi.websockets import WebSocket
 from typing import Dict
+from sockets.pubsub import RoomBroadcaster
+from sockets.outbound import ConnectionWriter, OverflowPolicy
+from db.write_behind import WriteBehindBuffer
+from sockets.protocols import Frame, receive
 
 
 class ConnectionManager:
     
-        def __init__(self):
+        def __init__(
+            self,
+            broadcaster: RoomBroadcaster = None,
+            max_queue_size: int = 256,
+            overflow_policy: str = OverflowPolicy.DROP_OLDEST,
+            coalesce_window: float = 0,
+        ):
             # Map room_id to a list of WebSocket connections
             self.active_connections: Dict[str, set] = {}
+            # When set, frames are fanned out to every worker through Redis.
+            self.broadcaster = broadcaster
+            # One writer task with a bounded send queue per connection.
+            self.writers: Dict[WebSocket, ConnectionWriter] = {}
+            self.max_queue_size = max_queue_size
+            self.overflow_policy = overflow_policy
+            self.closed_sent = 0
+            self.closed_dropped = 0
+            # Messages of a room arriving within the window go out as one frame.
+            self.coalesce_window = coalesce_window
+            self.pending_messages: Dict[str, list] = {}
+            self.coalesce_tasks: set = set()
+            self.frames_broadcast = 0
+            self.messages_broadcast = 0
+
+        async def start(self):
+            if self.broadcaster is not None:
+                await self.broadcaster.start(deliver=self.deliver_published)
+
+        async def stop(self):
+            for task in list(self.coalesce_tasks):
+                task.cancel()
+            for room_id in list(self.pending_messages):
+                await self.flush_pending(room_id)
+            if self.broadcaster is not None:
+                await self.broadcaster.stop()
             
-        async def connect(self, room_id: str, websocket: WebSocket):
+        async def connect(
+            self, room_id: str, websocket: WebSocket, subprotocol: str = None
+        ):
             try:
-                await websocket.accept()
+                await websocket.accept(subprotocol=subprotocol)
+                writer = ConnectionWriter(
+                    websocket,
+                    max_queue_size=self.max_queue_size,
+                    overflow_policy=self.overflow_policy,
+                    subprotocol=subprotocol,
+                )
+                writer.start()
+                self.writers[websocket] = writer
                 if room_id not in self.active_connections:
                     self.active_connections[room_id] = []
+                    if self.broadcaster is not None:
+                        await self.broadcaster.subscribe(room_id)
                 self.active_connections[room_id].append(websocket)
                 print("ACTIVE CONNECTION: ", self.active_connections)
                 
@@ -22,33 +71,155 @@ class ConnectionManager:
 
         def ws_receive_text(self, websocket: WebSocket):
             return websocket.receive_text()
+
+        async def ws_receive(self, websocket: WebSocket):
+            """
+            Next decoded message of a socket, in its negotiated subprotocol.
+            """
+            writer = self.writers.get(websocket)
+            return await receive(websocket, writer.subprotocol if writer else None)
         
-        def disconnect(self, room_id: str, websocket: WebSocket):
+        async def disconnect(self, room_id: str, websocket: WebSocket):
+            writer = self.writers.pop(websocket, None)
+            if writer is not None:
+                await writer.close()
+                self.closed_sent += writer.sent
+                self.closed_dropped += writer.dropped
+
             if room_id in self.active_connections:
-                self.active_connections[room_id].remove(websocket)
+                if websocket in self.active_connections[room_id]:
+                    self.active_connections[room_id].remove(websocket)
                 if not self.active_connections[room_id]:  # Remove room if no connections remain
                     del self.active_connections[room_id]
+                    if self.broadcaster is not None:
+                        await self.broadcaster.unsubscribe(room_id)
 
         async def broadcast_message(self, room_id: str, message: dict):
+            await self.broadcast_messages(room_id, [message])
+
+        async def broadcast_messages(self, room_id: str, messages: list):
+            """
+            Broadcast messages as one frame: a single message as an object,
+            several as an array. With a coalescing window, messages of the
+            room are held until the window closes and sent together.
+            """
+            if not self.coalesce_window:
+                await self._broadcast_batch(room_id, messages)
+                return
+
+            if room_id not in self.pending_messages:
+                self.pending_messages[room_id] = []
+                task = asyncio.create_task(self._flush_after_window(room_id))
+                self.coalesce_tasks.add(task)
+                task.add_done_callback(self.coalesce_tasks.discard)
+            self.pending_messages[room_id].extend(messages)
+
+        async def _flush_after_window(self, room_id: str):
+            await asyncio.sleep(self.coalesce_window)
+            try:
+                await self.flush_pending(room_id)
+            except Exception as e:
+                print(f"Failed to broadcast coalesced messages: {e}")
+
+        async def flush_pending(self, room_id: str):
+            messages = self.pending_messages.pop(room_id, None)
+            if messages:
+                await self._broadcast_batch(room_id, messages)
+
+        async def _broadcast_batch(self, room_id: str, messages: list):
+            self.frames_broadcast += 1
+            self.messages_broadcast += len(messages)
+            frame = Frame(messages[0] if len(messages) == 1 else messages)
+            await self.broadcast_frame(room_id, frame)
+
+        async def broadcast_event(self, room_id: str, event: dict):
+            """
+            Send an event such as a read receipt right away, outside any
+            coalescing window and the message counters.
+            """
+            await self.broadcast_frame(room_id, Frame(event))
+
+        async def send_event(self, websocket: WebSocket, event: dict):
+            """
+            Send an event to one socket only, e.g. an error for its sender.
+            """
+            writer = self.writers.get(websocket)
+            if writer is not None:
+                await writer.enqueue(Frame(event).encoded(writer.subprotocol))
+
+        async def broadcast_frame(self, room_id: str, frame: Frame):
+            if self.broadcaster is not None:
+                # The compact MessagePack form travels between workers.
+                await self.broadcaster.publish(room_id, frame.binary)
+                return
+            await self.deliver_local(room_id, frame)
+
+        async def deliver_published(self, room_id: str, data: bytes):
+            await self.deliver_local(room_id, Frame(binary=data))
+
+        async def deliver_local(self, room_id: str, frame: Frame):
             if room_id in self.active_connections:
-                for websocket in self.active_connections[room_id]:
-                    await websocket.send_json(message)
+                for websocket in list(self.active_connections[room_id]):
+                    writer = self.writers.get(websocket)
+                    if writer is not None:
+                        await writer.enqueue(frame.encoded(writer.subprotocol))
+
+        def stats(self) -> dict:
+            connections = {
+                id(websocket): writer.stats()
+                for websocket, writer in self.writers.items()
+            }
+            return {
+                "rooms": len(self.active_connections),
+                "connections": len(self.writers),
+                "overflow_policy": self.overflow_policy,
+                "coalesce_window_ms": self.coalesce_window * 1000,
+                "frames_broadcast": self.frames_broadcast,
+                "messages_broadcast": self.messages_broadcast,
+                "queued": sum(c["queue_depth"] for c in connections.values()),
+                "sent": self.closed_sent + sum(c["sent"] for c in connections.values()),
+                "dropped": self.closed_dropped
+                + sum(c["dropped"] for c in connections.values()),
+                "slow_consumers": [
+                    c
+                    for c in connections.values()
+                    if c["queue_depth"] * 2 >= c["max_queue_size"] or c["closed"]
+                ],
+            }
 
 class Chatmanager:
+
+    def __init__(self, message_buffer: WriteBehindBuffer = None):
+        self.message_buffer = message_buffer or WriteBehindBuffer(
+            collection_name="user_messages"
+        )
+
+    async def start(self):
+        await self.message_buffer.start()
+
+    async def stop(self):
+        # Flush pending messages before the worker exits.
+        await self.message_buffer.stop()
     
     async def check_room(self):
         pass
         # find the room
         # if not room then create it else get it and return the room info. 
     
-    async def create_message(self, data: dict):
+    async def create_message(self, data: dict) -> bool:
+        return (await self.create_messages([data]))[0]
+
+    async def create_messages(self, data: list) -> list:
+        """
+        Persist messages; returns whether each one was written.
+        """
         try:
-            db = await get_database()
-            await db['user_messages'].insert_one(data)
+            return await self.message_buffer.enqueue_many(data)
 
         except Exception as e:
             print("ErrorL ", e)
-    
+            return [False] * len(data)
+
     async def get_room(self, room_id):
         db = await get_database()
         room_info = await db['chat_room'].find_one({"room_id": room_id})
@@ -0,0 +1,118 @@
+import asyncio
+from fastapi import status
+from fastapi.websockets import WebSocket
+
+
+class OverflowPolicy:
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+    BLOCK = "block"
+
+
+class ConnectionWriter:
+    """
+    Outbound side of one WebSocket connection.
+
+    Frames arrive already encoded (text or bytes) for the negotiated
+    `subprotocol`, are put on a bounded queue and written by a dedicated
+    task, so a slow client only delays itself. When the queue is full the
+    overflow policy decides whether to drop the oldest frame, disconnect
+    the client or make the producer wait.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue_size: int = 256,
+        overflow_policy: str = OverflowPolicy.DROP_OLDEST,
+        subprotocol: str = None,
+        close_timeout: float = 5,
+    ) -> None:
+        self.websocket = websocket
+        self.subprotocol = subprotocol
+        self.overflow_policy = overflow_policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.task: asyncio.Task = None
+        self.close_timeout = close_timeout
+        self.close_task: asyncio.Task = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def enqueue(self, frame) -> bool:
+        """
+        Queue a frame for delivery. Returns False when the frame was not
+        accepted because the connection is closed or being disconnected.
+        """
+        if self.closed:
+            return False
+
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            await self.queue.put(frame)
+            return True
+
+        if self.queue.full():
+            if self.overflow_policy == OverflowPolicy.DISCONNECT:
+                self.dropped += self.queue.qsize() + 1
+                self._disconnect_slow_consumer()
+                return False
+
+            # drop oldest
+            self.queue.get_nowait()
+            self.dropped += 1
+
+        self.queue.put_nowait(frame)
+        return True
+
+    def _disconnect_slow_consumer(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+        # Closing waits on the stalled peer; keep it off the broadcast path.
+        self.close_task = asyncio.create_task(self._close_slow_websocket())
+
+    async def _close_slow_websocket(self):
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER),
+                timeout=self.close_timeout,
+            )
+        except Exception as e:
+            print(f"Failed to close slow websocket: {e}")
+
+    async def _run(self):
+        while True:
+            frame = await self.queue.get()
+            try:
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                self.sent += 1
+            except Exception as e:
+                print(f"Failed to send frame: {e}")
+                self.closed = True
+                return
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_size": self.queue.maxsize,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed": self.closed,
+            "subprotocol": self.subprotocol,
+        }
@@ -0,0 +1,78 @@
+from typing import Optional
+from fastapi.websockets import WebSocket, WebSocketDisconnect
+from serializer.fast_json import dumps, loads
+from serializer.msgpack_codec import pack, unpack
+
+# Negotiated with `Sec-WebSocket-Protocol`; without it frames are JSON text.
+MSGPACK_SUBPROTOCOL = "leochat.msgpack.v1"
+SUBPROTOCOLS = (MSGPACK_SUBPROTOCOL,)
+
+
+def negotiate(websocket: WebSocket) -> Optional[str]:
+    """
+    Pick the first subprotocol offered by the client that the server
+    speaks, or None for the JSON default.
+    """
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+
+async def receive(websocket: WebSocket, subprotocol: Optional[str]):
+    """
+    Receive and decode the next frame: MessagePack binary frames on the
+    msgpack subprotocol, JSON text or binary frames otherwise.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+
+    if message.get("bytes") is not None:
+        if subprotocol == MSGPACK_SUBPROTOCOL:
+            return unpack(message["bytes"])
+        return loads(message["bytes"])
+    return loads(message["text"])
+
+
+class Frame:
+    """
+    One outgoing message, encoded lazily and at most once per protocol,
+    however many sockets of the room receive it.
+
+    The MessagePack form is what goes over Redis pub/sub; a frame received
+    from there is decoded only if a JSON client needs it.
+    """
+
+    __slots__ = ("_message", "_text", "_binary")
+
+    def __init__(self, message=None, text: str = None, binary: bytes = None) -> None:
+        self._message = message
+        self._text = text
+        self._binary = binary
+
+    @property
+    def message(self):
+        if self._message is None:
+            if self._binary is not None:
+                self._message = unpack(self._binary)
+            else:
+                self._message = loads(self._text)
+        return self._message
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.message).decode()
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = pack(self.message)
+        return self._binary
+
+    def encoded(self, subprotocol: Optional[str]):
+        if subprotocol == MSGPACK_SUBPROTOCOL:
+            return self.binary
+        return self.text
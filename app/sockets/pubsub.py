@@ -0,0 +1,107 @@
+import asyncio
+import typing
+import redis.asyncio as redis
+from db.redis.redis_connection import Redis
+
+
+class RoomBroadcaster:
+    """
+    Fan out room frames to every worker through Redis pub/sub.
+
+    A worker only subscribes to the channel of a room while it holds at
+    least one local connection for that room. Frames published by any
+    worker (including this one) are handed to `deliver(room_id, data)`.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis = None,
+        channel_prefix: str = "chat_room",
+        poll_timeout: float = 1.0,
+    ) -> None:
+        self.redis_client = redis_client
+        self.channel_prefix = channel_prefix
+        self.poll_timeout = poll_timeout
+        self.deliver: typing.Callable[[str, bytes], typing.Awaitable] = None
+        self.pubsub = None
+        self.listener_task: asyncio.Task = None
+        self.rooms: set = set()
+        self.has_rooms = asyncio.Event()
+
+    def channel(self, room_id: str) -> str:
+        return f"{self.channel_prefix}:{room_id}"
+
+    def room_from_channel(self, channel) -> str:
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        return channel[len(self.channel_prefix) + 1 :]
+
+    async def start(self, deliver: typing.Callable[[str, bytes], typing.Awaitable]):
+        """
+        Open the subscriber connection and start the listener task.
+        """
+        self.redis_client = self.redis_client or Redis.redis_client
+        self.deliver = deliver
+        self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        self.listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.listener_task is not None:
+            self.listener_task.cancel()
+            try:
+                await self.listener_task
+            except asyncio.CancelledError:
+                pass
+            self.listener_task = None
+
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+            self.pubsub = None
+        self.rooms.clear()
+        self.has_rooms.clear()
+
+    async def subscribe(self, room_id: str):
+        if room_id in self.rooms:
+            return
+        self.rooms.add(room_id)
+        await self.pubsub.subscribe(self.channel(room_id))
+        self.has_rooms.set()
+
+    async def unsubscribe(self, room_id: str):
+        if room_id not in self.rooms:
+            return
+        self.rooms.discard(room_id)
+        if not self.rooms:
+            self.has_rooms.clear()
+        await self.pubsub.unsubscribe(self.channel(room_id))
+
+    async def publish(self, room_id: str, data: typing.Union[str, bytes]):
+        await self.redis_client.publish(self.channel(room_id), data)
+
+    async def _listen(self):
+        while True:
+            if not self.pubsub.subscribed:
+                await self.has_rooms.wait()
+                if not self.pubsub.subscribed:
+                    await asyncio.sleep(self.poll_timeout)
+                continue
+
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.poll_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis pub/sub error: {e}")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            room_id = self.room_from_channel(message["channel"])
+            try:
+                await self.deliver(room_id, message["data"])
+            except Exception as e:
+                print(f"Failed to deliver frame to room {room_id}: {e}")
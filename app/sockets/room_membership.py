@@ -0,0 +1,54 @@
+import asyncio
+from uuid import UUID
+from db.db_connection import MongoClientRegistry
+from utils.cache import TTLCache
+
+
+class RoomMembershipCache:
+    """
+    In-memory cache of `chat_room.members`, bounded by LRU and TTL.
+
+    Membership is loaded from Mongo once when a socket connects; later
+    checks on the message path are set lookups. Concurrent misses for the
+    same room share a single query.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300) -> None:
+        self.rooms = TTLCache(max_size=max_size, ttl=ttl)
+        self.loading: dict = {}
+
+    async def members(self, room_id: UUID):
+        """
+        Return the member ids of a room, or None if the room does not exist.
+        """
+        members = self.rooms.get(room_id)
+        if members is not None:
+            return members
+
+        if room_id not in self.loading:
+            self.loading[room_id] = asyncio.ensure_future(self._load(room_id))
+        try:
+            return await asyncio.shield(self.loading[room_id])
+        finally:
+            self.loading.pop(room_id, None)
+
+    async def _load(self, room_id: UUID):
+        db = MongoClientRegistry.get_database()
+        room_info = await db["chat_room"].find_one(
+            {"room_id": room_id}, {"_id": 0, "members": 1}
+        )
+        if not room_info:
+            return None
+        return self.set(room_id, room_info.get("members", []))
+
+    async def is_member(self, room_id: UUID, user_id: UUID) -> bool:
+        members = await self.members(room_id)
+        return members is not None and user_id in members
+
+    def set(self, room_id: UUID, members: list) -> frozenset:
+        members = frozenset(members)
+        self.rooms.set(room_id, members)
+        return members
+
+    def invalidate(self, room_id: UUID):
+        self.rooms.pop(room_id)
@@ -1,12 +1,67 @@
-from fastapi import WebSocket, WebSocketDisconnect, Depends
-from schemas.chat import MessageModel
-from sockets import connection_manager, chat_manager
+from fastapi import WebSocket, WebSocketDisconnect, Depends, status
+from pydantic import TypeAdapter
+from schemas.chat import MessageModel, ReadReceipt
+from utils import settings as st
+from sockets import connection_manager, chat_manager, room_membership
+from sockets.protocols import negotiate
 from api.dependencies import is_authenticated_user_websocket
-from utils.helpers import convert_str_to_binary_uuid
+from utils.helpers import convert_str_to_binary_uuid, truncate_to_millis, to_utc
+from db.redis.recent_messages import recent_messages
+from db.redis.response_cache import chat_list_cache
+from db.read_watermarks import read_watermarks, resolve_read_at, unread_after
+from db.redis.unread_counters import unread_counters
 
 
 # active_connections: dict[str, set] = dict()
 
+message_batch_adapter = TypeAdapter(list[MessageModel])
+
+
+def parse_messages(payload) -> list:
+    """
+    A frame carries one message object or an array of them.
+    """
+    if isinstance(payload, list):
+        if len(payload) > st.WS_MAX_BATCH_SIZE:
+            raise ValueError(f"At most {st.WS_MAX_BATCH_SIZE} messages per frame.")
+        return message_batch_adapter.validate_python(payload)
+    return [MessageModel.model_validate(payload)]
+
+
+def is_read_receipt(payload) -> bool:
+    return isinstance(payload, dict) and payload.get("type") == "read"
+
+
+async def handle_read_receipt(room_id: str, binary_room_id, user_id, payload: dict):
+    """
+    `{"type": "read", "read_at"?, "message_id"?}` advances the sender's
+    watermark and tells the room.
+    """
+    receipt = ReadReceipt.model_validate(payload)
+    read_at = await resolve_read_at(
+        binary_room_id,
+        read_at=receipt.read_at,
+        message_id=receipt.message_id,
+        message_buffer=chat_manager.message_buffer,
+    )
+    if read_at is None:
+        print(f"Read receipt for unknown message: {receipt.message_id}")
+        return
+
+    read_at = await read_watermarks.mark_read(user_id, binary_room_id, read_at)
+    unread = await unread_after(
+        binary_room_id, user_id, read_at, message_buffer=chat_manager.message_buffer
+    )
+    await unread_counters.set(user_id, binary_room_id, unread)
+    await connection_manager.broadcast_event(
+        room_id=room_id,
+        event={
+            "type": "read",
+            "user_id": str(user_id),
+            "read_at": to_utc(read_at),
+        },
+    )
+
 
 async def chat_websocket_endpoint(
     websocket: WebSocket,
@@ -30,39 +85,101 @@ async def chat_websocket_endpoint(
     as well as in websocket
     """
 
-    await connection_manager.connect(room_id=room_id, websocket=websocket)
-    print(f"WebSocket connection established for chat id: .{room_id}")
-
-    # Notify other participants
+    # Admit only members of the room; this is the only membership query.
     is_converted, binary_room_id = convert_str_to_binary_uuid(room_id)
-    if not is_converted:
-        print("Enter Horrer Message |_-^-_|")
+    user_id = current_user.get("user_id", None)
+    if not is_converted or not await room_membership.is_member(
+        binary_room_id, user_id
+    ):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await connection_manager.connect(
+        room_id=room_id, websocket=websocket, subprotocol=negotiate(websocket)
+    )
+    print(f"WebSocket connection established for chat id: .{room_id}")
 
     try:
         while True:
             # Established the connection and receive the message the from client side.
-            message = await connection_manager.ws_receive_text(websocket)
-
-            # DUMP THE DATA IN JSON.
-            message_info = MessageModel.model_validate_json(message).model_dump()
-            message_info["sent_by"] = current_user.get("user_id", None)
-            message_info["room_id"] = binary_room_id
-            await chat_manager.create_message(data=message_info)
-
-            # room_info = await chat_manager.get_room(room_id=binary_room_id)
-            message = {
-                "message": message_info["message"],
-                "sent_by": current_user["email"],
-                "sent_at": message_info.get("sent_at").isoformat(),
-            }
-            await connection_manager.broadcast_message(room_id=room_id, message=message)
+            # JSON text by default, MessagePack on the msgpack subprotocol.
+            payload = await connection_manager.ws_receive(websocket)
+            is_receipt = is_read_receipt(payload)
+            message_models = [] if is_receipt else parse_messages(payload)
+            if not is_receipt and not message_models:
+                continue
+
+            # Served from the membership cache, no Mongo round trip.
+            if not await room_membership.is_member(binary_room_id, user_id):
+                await connection_manager.disconnect(room_id, websocket)
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+
+            if is_receipt:
+                await handle_read_receipt(room_id, binary_room_id, user_id, payload)
+                continue
+
+            message_infos, messages, recent = [], [], []
+            for message_model in message_models:
+                message_info = message_model.model_dump()
+                message_info["sent_by"] = user_id
+                message_info["room_id"] = binary_room_id
+                message_info["sent_at"] = truncate_to_millis(message_info["sent_at"])
+                message_infos.append(message_info)
+
+                # `sent_at` stays a datetime so each subprotocol encodes it natively,
+                # in UTC so local and Redis fan-out deliver the same value.
+                messages.append(
+                    {
+                        "message": message_info["message"],
+                        "sent_by": current_user["email"],
+                        "sent_at": to_utc(message_info["sent_at"]),
+                    }
+                )
+                recent.append(
+                    {
+                        "message_id": str(message_info["message_id"]),
+                        "message": message_info["message"],
+                        "is_read": message_info["is_read"],
+                        "sent_at": message_info["sent_at"].isoformat(),
+                        "sent_by": current_user["email"],
+                    }
+                )
+
+            # A batch frame is written with one insert and broadcast as one frame.
+            written = await chat_manager.create_messages(data=message_infos)
+            failed = [
+                str(message_info["message_id"])
+                for message_info, ok in zip(message_infos, written)
+                if not ok
+            ]
+            if failed:
+                # Unwritten messages are neither listed, counted nor broadcast.
+                await connection_manager.send_event(
+                    websocket, {"type": "error", "failed_message_ids": failed}
+                )
+                recent = [item for item, ok in zip(recent, written) if ok]
+                messages = [item for item, ok in zip(messages, written) if ok]
+            if not messages:
+                continue
+
+            await recent_messages.append_many(str(binary_room_id), recent)
+            await chat_list_cache.invalidate(str(binary_room_id))
+            members = await room_membership.members(binary_room_id) or ()
+            await unread_counters.increment(
+                binary_room_id,
+                (member for member in members if member != user_id),
+                count=len(messages),
+            )
+            await connection_manager.broadcast_messages(room_id=room_id, messages=messages)
 
     except WebSocketDisconnect:
         print("WebSocket connection closed.")
-        await connection_manager.disconnect(room_id)
+        await connection_manager.disconnect(room_id, websocket)
 
     except Exception as e:
         print(f"Error****************: {e}")
+        await connection_manager.disconnect(room_id, websocket)
         await websocket.close(code=1003)
 
     # finally:
@@ -0,0 +1,94 @@
+from datetime import datetime
+from pymongo import UpdateOne
+
+CONTACT_FIELDS = ("name", "email", "contact_no", "has_account")
+
+
+def contact_key(contact: dict) -> tuple:
+    """
+    Identity of a contact in an address book: its email, or its number
+    for contacts without one.
+    """
+    if contact.get("email"):
+        return ("email", contact["email"])
+    return ("contact_no", contact.get("contact_no"))
+
+
+def normalize_contact(contact: dict) -> dict:
+    # Clients send "" for a missing email; store and compare it as None.
+    return {**contact, "email": contact.get("email") or None}
+
+
+def dedupe_contacts(contacts: list) -> dict:
+    """
+    Index normalized contacts by `contact_key`; a later entry replaces an
+    earlier one.
+    """
+    contacts = [normalize_contact(contact) for contact in contacts]
+    return {contact_key(contact): contact for contact in contacts}
+
+
+def diff_contacts(existing: list, incoming: dict) -> dict:
+    """
+    Compare deduplicated `incoming` contacts with the stored ones.
+
+    Contacts missing from `incoming` are left alone, so a client may sync
+    its address book in parts.
+    """
+    stored = dedupe_contacts(existing)
+    diff = {"added": [], "updated": [], "unchanged": []}
+    for key, contact in incoming.items():
+        current = stored.get(key)
+        if current is None:
+            diff["added"].append(contact)
+        elif any(current.get(field) != contact.get(field) for field in CONTACT_FIELDS):
+            diff["updated"].append(contact)
+        else:
+            diff["unchanged"].append(contact)
+    return diff
+
+
+def contact_sync_operations(account_filter: dict, diff: dict) -> list:
+    """
+    Write operations applying `diff` to an account: one `$push` for every
+    added contact and one `arrayFilters` update per changed contact.
+    """
+    now = datetime.now()
+    operations = []
+    if diff["added"]:
+        operations.append(
+            UpdateOne(
+                account_filter,
+                {
+                    "$push": {
+                        "contacts_info": {
+                            "$each": [
+                                {**contact, "added_at": now} for contact in diff["added"]
+                            ]
+                        }
+                    }
+                },
+            )
+        )
+    for contact in diff["updated"]:
+        field, value = contact_key(contact)
+        array_filter = {f"contact.{field}": value}
+        if field == "contact_no":
+            # Matches a missing, null or empty stored email.
+            array_filter["contact.email"] = {"$in": [None, ""]}
+        operations.append(
+            UpdateOne(
+                account_filter,
+                {
+                    "$set": {
+                        **{
+                            f"contacts_info.$[contact].{name}": contact.get(name)
+                            for name in CONTACT_FIELDS
+                        },
+                        "contacts_info.$[contact].updated_at": now,
+                    }
+                },
+                array_filters=[array_filter],
+            )
+        )
+    return operations
@@ -0,0 +1,125 @@
+"""
+Cached User-Agent fingerprinting.
+
+`user_agents.parse` is regex heavy and logins keep sending the same few
+User-Agent strings, so parsed results are kept in a bounded LRU.
+
+Recompute the derived fields of stored devices, e.g. after upgrading
+`user_agents`, with:
+
+    python -m utils.device_fingerprint
+
+Only devices that logged in since logins started storing the raw
+User-Agent string can be recomputed. Older devices have nothing to parse;
+their next login rewrites every field through `db.devices.upsert_device`.
+"""
+
+import asyncio
+from functools import lru_cache
+from pymongo import UpdateOne
+from user_agents import parse
+from utils import settings as st
+from db.db_connection import MongoClientRegistry
+from db.devices import DEVICES_COLLECTION
+
+
+def classify_device_type(user_agent) -> str:
+    device_type = "Unknown"
+    if user_agent.is_mobile:
+        device_type = "Mobile"
+    if user_agent.is_tablet:
+        device_type = "Tablet"
+    if user_agent.is_pc:
+        device_type = "PC"
+    return device_type
+
+
+@lru_cache(maxsize=st.DEVICE_FINGERPRINT_CACHE_SIZE)
+def _fingerprint(user_agent_string: str) -> tuple:
+    user_agent = parse(user_agent_string)
+    device_name = (
+        f"{user_agent.device.brand or 'Unknown'} {user_agent.device.model or 'Device'}"
+    )
+    return (
+        ("device_name", device_name),
+        ("os", user_agent.os.family),
+        ("browser", user_agent.browser.family),
+        ("device_type", classify_device_type(user_agent)),
+    )
+
+
+def fingerprint(user_agent_string: str) -> dict:
+    """
+    Device name, OS, browser and device type for a User-Agent string.
+    Returns a fresh dict, callers may modify it.
+    """
+    return dict(_fingerprint(user_agent_string or "Unknown"))
+
+
+def fingerprint_many(user_agent_strings: list) -> dict:
+    """
+    Fingerprint a batch of User-Agent strings, parsing each distinct one once.
+    """
+    return {
+        user_agent_string: fingerprint(user_agent_string)
+        for user_agent_string in set(user_agent_strings)
+    }
+
+
+def cache_stats() -> dict:
+    return _fingerprint.cache_info()._asdict()
+
+
+async def backfill_device_info(db, batch_size: int = 500) -> int:
+    """
+    Recompute the derived fields of every stored device that kept its
+    User-Agent string. Returns the number of updated devices; devices
+    without one are left for their next login.
+    """
+    updated = 0
+    devices = []
+
+    async def write_batch():
+        nonlocal updated, devices
+        # Devices of a batch share a handful of User-Agents; parse each once.
+        fingerprints = fingerprint_many([device["user_agent"] for device in devices])
+        operations = [
+            UpdateOne(
+                {"_id": device["_id"]}, {"$set": fingerprints[device["user_agent"]]}
+            )
+            for device in devices
+        ]
+        if operations:
+            await db[DEVICES_COLLECTION].bulk_write(operations, ordered=False)
+            updated += len(operations)
+        devices = []
+
+    cursor = db[DEVICES_COLLECTION].find(
+        {"user_agent": {"$exists": True, "$ne": None}},
+        {"_id": 1, "user_agent": 1},
+        batch_size=batch_size,
+    )
+    async for device in cursor:
+        devices.append(device)
+        if len(devices) >= batch_size:
+            await write_batch()
+
+    await write_batch()
+    return updated
+
+
+async def main():
+    try:
+        db = MongoClientRegistry.get_database()
+        updated = await backfill_device_info(db)
+        pending = await db[DEVICES_COLLECTION].count_documents(
+            {"$or": [{"user_agent": {"$exists": False}}, {"user_agent": None}]}
+        )
+        print(f"Recomputed {updated} devices. Cache: {cache_stats()}")
+        print(f"{pending} devices have no stored User-Agent; their next login fills them in.")
+    finally:
+        await MongoClientRegistry.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,25 +2,33 @@ import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List, Dict, Optional, Protocol
-from jinja2 import Environment, FileSystemLoader
+from typing import List, Dict, Optional, Protocol, Iterator, AsyncIterator
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
 from utils import settings as st
 
 # Step 1: Define SMTP Configuration
 class SMTPConfig:
     def __init__(
-        self, smtp_server: str, smtp_port: int, from_email: str, smtp_passwd: str
+        self,
+        smtp_server: str,
+        smtp_port: int,
+        from_email: str,
+        smtp_passwd: str,
+        use_tls: bool = True,
     ):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.from_email = from_email
         self.smtp_passwd = smtp_passwd
+        self.use_tls = use_tls
 
     def get_smtp_server(self):
         try:
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.from_email, self.smtp_passwd)
+            if self.use_tls:
+                server.starttls()
+            if self.smtp_passwd:
+                server.login(self.from_email, self.smtp_passwd)
             return server
         
         except Exception as e:
@@ -32,25 +40,117 @@ class SMTPConfig:
 class EmailTemplateProtocol(Protocol):
     def render(self, context: Dict[str, str]) -> str: ...
 
-# Step 3: Create EmailTemplate class to handle content
+# Step 3: Load and compile every email template once per process
+class EmailTemplateRegistry:
+    """
+    Process-wide Jinja environments for email templates.
+
+    `load` compiles every template of the directory up front, backed by an
+    on-disk bytecode cache so later cold starts skip parsing. A separate
+    async environment serves `render_async` and streaming renders.
+    """
+
+    template_dir: str = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "templates", "emails")
+    )
+    env: Environment = None
+    async_env: Environment = None
+
+    @classmethod
+    def load(
+        cls, template_dir: Optional[str] = None, cache_dir: Optional[str] = None
+    ):
+        cls.template_dir = template_dir or cls.template_dir
+        cache_dir = cache_dir or st.EMAIL_TEMPLATE_CACHE_DIR
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        loader = FileSystemLoader(cls.template_dir)
+        # Sync and async builds compile differently, so they get separate cache files.
+        cls.env = Environment(
+            loader=loader,
+            auto_reload=False,
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        )
+        cls.async_env = Environment(
+            loader=loader,
+            auto_reload=False,
+            enable_async=True,
+            bytecode_cache=FileSystemBytecodeCache(
+                cache_dir, pattern="__jinja2_async_%s.cache"
+            ),
+        )
+
+        for template_name in cls.env.list_templates(extensions=["html"]):
+            cls.env.get_template(template_name)
+            cls.async_env.get_template(template_name)
+
+    @classmethod
+    def get(cls, template_file: str) -> Template:
+        if cls.env is None:
+            cls.load()
+        return cls.env.get_template(template_file)
+
+    @classmethod
+    def get_async(cls, template_file: str) -> Template:
+        if cls.async_env is None:
+            cls.load()
+        return cls.async_env.get_template(template_file)
+
+
+# Step 4: Create EmailTemplate class to handle content
 class EmailTemplate:
     def __init__(self, template_file: str, template_dir: Optional[str] = None):
-        template_dir = template_dir or os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "..", "templates", "emails")
-        )
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+        # A custom directory gets its own environment; the default one is shared.
+        self.env = None
+        if template_dir:
+            self.env = Environment(loader=FileSystemLoader(template_dir))
         self.template_file = template_file
+
+    def get_template(self) -> Template:
+        if self.env is not None:
+            return self.env.get_template(self.template_file)
+        return EmailTemplateRegistry.get(self.template_file)
         
     def render(self, context: Dict[str, str]) -> str:
         try:
-            template = self.env.get_template(self.template_file)
-            return template.render(context)
+            return self.get_template().render(context)
 
         except Exception as e:
             raise ValueError(f"Error rendering template: {e}")
 
+    def stream(self, context: Dict[str, str]) -> Iterator[str]:
+        """
+        Yield the rendered email in chunks instead of one string.
+        """
+        return self.get_template().generate(context)
 
-# Step 4: Define Mailer class for sending emails
+    async def render_async(self, context: Dict[str, str]) -> str:
+        try:
+            template = EmailTemplateRegistry.get_async(self.template_file)
+            return await template.render_async(context)
+
+        except Exception as e:
+            raise ValueError(f"Error rendering template: {e}")
+
+    def stream_async(self, context: Dict[str, str]) -> AsyncIterator[str]:
+        return EmailTemplateRegistry.get_async(self.template_file).generate_async(
+            context
+        )
+
+
+def build_message(
+    from_email: str, to_emails: List[str], subject: str, email_content: str
+) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = from_email
+    msg["To"] = ", ".join(to_emails)
+    msg["Subject"] = subject
+    msg.attach(MIMEText(email_content, "html"))
+    return msg
+
+
+# Step 5: Define Mailer class for sending emails
 class Mailer:
     def __init__(self, smtp_config: SMTPConfig):
         self.smtp_config = smtp_config
@@ -62,11 +162,9 @@ class Mailer:
         try:
             self.server = self.smtp_config.get_smtp_server()
 
-            msg = MIMEMultipart()
-            msg["From"] = self.smtp_config.from_email
-            msg["To"] = ", ".join(to_emails)
-            msg["Subject"] = subject
-            msg.attach(MIMEText(email_content, "html"))
+            msg = build_message(
+                self.smtp_config.from_email, to_emails, subject, email_content
+            )
 
             self.server.sendmail(
                 self.smtp_config.from_email, to_emails, msg.as_string()
@@ -79,7 +177,7 @@ class Mailer:
                 self.server.quit()
 
 
-# Step 5: Define a higher-level EmailService class for different types of emails
+# Step 6: Define a higher-level EmailService class for different types of emails
 class EmailService:
     def __init__(self, mailer: Mailer, template: EmailTemplate):
         self.mailer = mailer
@@ -100,20 +198,3 @@ class EmailService:
         # subject = "New Login Alert"
         email_content = self.template.render(context)
         return self.mailer.send_email(to_emails, subject, email_content)
-
-
-def simple_mailer(template_file: str, context, to_emails, subject):
-
-    smtp_config = SMTPConfig(
-        smtp_server=st.EMAIL_HOST,
-        smtp_port=st.EMAIL_PORT,
-        from_email=st.EMAIL_HOST_USER,
-        smtp_passwd=st.EMAIL_HOST_PASSWORD,
-    )
-    mailer = Mailer(smtp_config)
-    
-    # For a registration email
-    registration_template = EmailTemplate(template_file)
-    email_service = EmailService(mailer, registration_template)
-    email_service.send_simple_email(to_emails, context, subject)
-    
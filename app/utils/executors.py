@@ -0,0 +1,99 @@
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from utils import settings as st
+
+
+def _timed_call(fn, args, kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class CPUExecutor:
+    """
+    Process pool for CPU-bound work (password hashing and the like) that
+    would otherwise block the event loop.
+
+    At most `max_pending` calls are submitted at once; further callers wait
+    for a slot, which bounds the queue. Queue wait and execution time are
+    recorded for every call.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = 64) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pool: ProcessPoolExecutor = None
+        self.slots: asyncio.Semaphore = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.exec_time_total = 0.0
+        self.exec_time_max = 0.0
+
+    def start(self):
+        if self.pool is None:
+            # `spawn` keeps the Motor/Redis client threads out of the children.
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self.slots = asyncio.Semaphore(self.max_pending)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` in the pool. `fn` and its arguments must be
+        picklable, i.e. module-level functions and plain data.
+        """
+        self.start()
+        self.submitted += 1
+        enqueued_at = time.perf_counter()
+
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            try:
+                result, exec_time = await loop.run_in_executor(
+                    self.pool, _timed_call, fn, args, kwargs
+                )
+            except Exception:
+                self.failed += 1
+                raise
+
+        queue_wait = time.perf_counter() - enqueued_at - exec_time
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.exec_time_total += exec_time
+        self.exec_time_max = max(self.exec_time_max, exec_time)
+        return result
+
+    async def map(self, fn, items: list) -> list:
+        return await asyncio.gather(*(self.run(fn, item) for item in items))
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.submitted - self.completed - self.failed,
+            "queue_wait_avg_ms": self.queue_wait_total / completed * 1000,
+            "queue_wait_max_ms": self.queue_wait_max * 1000,
+            "exec_time_avg_ms": self.exec_time_total / completed * 1000,
+            "exec_time_max_ms": self.exec_time_max * 1000,
+        }
+
+
+cpu_executor = CPUExecutor(
+    max_workers=st.CPU_POOL_WORKERS, max_pending=st.CPU_POOL_MAX_PENDING
+)
@@ -1,4 +1,5 @@
 import re
+import base64
 import random
 
 # import hashlib
@@ -16,13 +17,14 @@ def get_payload(
     ok: bool = False,
     is_authenticated: bool = False,
     details: Any = None,
+    meta_info: dict = None,
 ):
     payload = {
         "ok": ok,
         "is_authenticated": is_authenticated,
         "message": message,
         "details": details,
-        "meta_info": {},
+        "meta_info": meta_info or {},
     }
     return payload
 
@@ -108,3 +110,45 @@ def convert_str_to_binary_uuid(str_uuid: str):
     except Exception as e:
         print("ErrorL ", e)
         return  False, None
+
+
+def encode_history_cursor(sent_at: str, message_id: str) -> str:
+    """
+    Build an opaque pagination cursor from a message's ISO `sent_at` and
+    `message_id`.
+    """
+    raw = f"{sent_at}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor built by `encode_history_cursor`.
+
+    Raises:
+    ------
+    ValueError:
+        If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sent_at, message_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(sent_at), UUID(message_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+
+def truncate_to_millis(value: datetime) -> datetime:
+    """
+    Drop sub-millisecond precision so a timestamp compares equal to the
+    value MongoDB stores for it.
+    """
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def to_utc(value: datetime) -> datetime:
+    """
+    Aware UTC form of a timestamp; naive values are local time. Broadcast
+    frames carry this form so every backend and subprotocol agrees.
+    """
+    return value.astimezone(timezone.utc)
@@ -0,0 +1,198 @@
+import asyncio
+import smtplib
+from typing import Dict, List
+from utils import settings as st
+from utils.emails import SMTPConfig, EmailTemplate, build_message
+
+
+class MailQueue:
+    """
+    Background email delivery.
+
+    Endpoints enqueue a message and return immediately. `pool_size`
+    workers each keep one SMTP session open and reuse it for every
+    message, taking up to `batch_size` queued messages per round. A failed
+    message is retried with exponential backoff up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        smtp_config: SMTPConfig,
+        pool_size: int = 2,
+        batch_size: int = 20,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_queue_size: int = 10000,
+    ) -> None:
+        self.smtp_config = smtp_config
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.workers: List[asyncio.Task] = []
+        self.sessions: Dict[int, smtplib.SMTP] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self):
+        self.workers = [
+            asyncio.create_task(self._worker(worker_id))
+            for worker_id in range(self.pool_size)
+        ]
+
+    async def stop(self, timeout: float = 10):
+        """
+        Give queued messages `timeout` seconds to go out, then close the
+        SMTP sessions.
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Mail queue stopped with {self.queue.qsize()} unsent emails.")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        for worker_id in list(self.sessions):
+            await asyncio.to_thread(self._close_session, worker_id)
+
+    def enqueue(
+        self, template_file: str, context: dict, to_emails: List[str], subject: str
+    ):
+        """
+        Queue an email. Raises `asyncio.QueueFull` when the queue is full.
+        """
+        self.queue.put_nowait(
+            {
+                "template_file": template_file,
+                "context": context,
+                "to_emails": to_emails,
+                "subject": subject,
+                "attempt": 0,
+            }
+        )
+
+    def enqueue_many(self, template_file: str, emails: List[tuple], subject: str) -> int:
+        """
+        Queue one email per `(context, to_emails)` pair. Stops at the first
+        one that does not fit and returns how many were queued.
+        """
+        queued = 0
+        for context, to_emails in emails:
+            try:
+                self.enqueue(template_file, context, to_emails, subject)
+            except asyncio.QueueFull:
+                break
+            queued += 1
+        return queued
+
+    async def _worker(self, worker_id: int):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                failures = await asyncio.to_thread(self._send_batch, worker_id, batch)
+            except Exception as e:
+                print(f"Mail worker {worker_id} error: {e}")
+                failures = batch
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+            self.sent += len(batch) - len(failures)
+            for job in failures:
+                self._retry(job)
+
+    def _retry(self, job: dict):
+        job["attempt"] += 1
+        if job["attempt"] > self.max_retries:
+            self.failed += 1
+            print(f"Giving up on email to {job['to_emails']}: {job.get('error')}")
+            return
+
+        self.retried += 1
+        delay = self.backoff * 2 ** (job["attempt"] - 1)
+        asyncio.get_running_loop().call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: dict):
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.failed += 1
+            print(f"Mail queue full, dropping email to {job['to_emails']}")
+
+    # The methods below run in a worker thread.
+
+    def _session(self, worker_id: int) -> smtplib.SMTP:
+        session = self.sessions.get(worker_id)
+        if session is not None:
+            try:
+                if session.noop()[0] == 250:
+                    return session
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_session(worker_id)
+
+        session = self.smtp_config.get_smtp_server()
+        self.sessions[worker_id] = session
+        return session
+
+    def _close_session(self, worker_id: int):
+        session = self.sessions.pop(worker_id, None)
+        if session is not None:
+            try:
+                session.quit()
+            except Exception:
+                session.close()
+
+    def _send_batch(self, worker_id: int, batch: List[dict]) -> List[dict]:
+        failures = []
+        for job in batch:
+            try:
+                session = self._session(worker_id)
+                content = EmailTemplate(job["template_file"]).render(job["context"])
+                msg = build_message(
+                    self.smtp_config.from_email,
+                    job["to_emails"],
+                    job["subject"],
+                    content,
+                )
+                session.sendmail(
+                    self.smtp_config.from_email, job["to_emails"], msg.as_string()
+                )
+            except Exception as e:
+                job["error"] = str(e)
+                failures.append(job)
+                self._close_session(worker_id)
+        return failures
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "workers": len(self.workers),
+            "open_sessions": len(self.sessions),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+mail_queue = MailQueue(
+    smtp_config=SMTPConfig(
+        smtp_server=st.EMAIL_HOST,
+        smtp_port=st.EMAIL_PORT,
+        from_email=st.EMAIL_HOST_USER,
+        smtp_passwd=st.EMAIL_HOST_PASSWORD,
+        use_tls=st.EMAIL_USE_TLS,
+    ),
+    pool_size=st.EMAIL_POOL_SIZE,
+    batch_size=st.EMAIL_BATCH_SIZE,
+    max_retries=st.EMAIL_MAX_RETRIES,
+    max_queue_size=st.EMAIL_QUEUE_SIZE,
+)
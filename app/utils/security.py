@@ -3,25 +3,39 @@ import hashlib
 from fastapi.websockets import WebSocket
 from passlib.hash import pbkdf2_sha256
 from fastapi.requests import Request
-from user_agents import parse  # Install: pip install pyyaml ua-parser user-agents
+from utils.device_fingerprint import fingerprint
 import uuid
+from utils.executors import cpu_executor
 
 
 def hash_password(password: str) -> str:
     return pbkdf2_sha256.hash(password)
 
 
+def hash_passwords(passwords: list) -> list:
+    return [pbkdf2_sha256.hash(password) for password in passwords]
+
+
 def verify_password(password: str, hashed_password: str) -> bool:
     return pbkdf2_sha256.verify(password, hashed_password)
 
 
-def is_authenticated(user_data: dict, client_credentials: dict) -> bool:
+async def hash_password_async(password: str) -> str:
+    return await cpu_executor.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await cpu_executor.run(verify_password, password, hashed_password)
+
+
+async def is_authenticated_async(user_data: dict, client_credentials: dict) -> bool:
     client_password = client_credentials.get("password", None)
     db_password = user_data.get("password", None)
-    is_verified = verify_password(password=client_password, hashed_password=db_password)
-    if not is_verified:
+    if not client_password or not db_password:
         return False
-    return True
+    return await verify_password_async(
+        password=client_password, hashed_password=db_password
+    )
 
 def generate_hash(info: str) -> str:
     return hashlib.sha256(f"{info}".encode()).hexdigest()
@@ -46,31 +60,8 @@ def generate_device_id_websocket(websocket: WebSocket, email: str):
 
 def get_device_info(request: Request) -> dict:
     user_agent_string = request.headers.get("User-Agent", "Unknown")
-    user_agent = parse(user_agent_string)
-
-    device_name = (
-        f"{user_agent.device.brand or 'Unknown'} {user_agent.device.model or 'Device'}"
-    )
-    os = user_agent.os.family
-    browser = user_agent.browser.family
-    is_mobile = user_agent.is_mobile
-    is_tablet = user_agent.is_tablet
-    is_pc = user_agent.is_pc
-
-    device_type = "Unknown"
-    if is_mobile:
-        device_type = "Mobile"
-    if is_tablet:
-        device_type = "Tablet"
-    if is_pc:
-        device_type = "PC"
-    
-    device_info = {
-        "device_name": device_name,
-        "os": os,
-        "browser": browser,
-        "device_type": device_type,
-    }
+    device_info = fingerprint(user_agent_string)
+    device_info["user_agent"] = user_agent_string
     return device_info
 
 
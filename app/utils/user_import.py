@@ -0,0 +1,232 @@
+"""
+Bulk user import.
+
+Reads users as CSV (a header row naming `email`, `mobile_no`, `password`
+and optionally `confirm_password`) or NDJSON (one JSON object per line).
+Rows are processed in batches: passwords are hashed across the CPU process
+pool, each batch is written with one unordered `insert_many` and the
+verification emails are queued on the mail queue.
+
+    python -m utils.user_import users.csv
+    python -m utils.user_import users.ndjson --format ndjson
+
+Quoted CSV fields may not contain line breaks.
+"""
+
+import csv
+import sys
+import json
+import asyncio
+from typing import AsyncIterator
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from schemas.auth import UserRegisteration
+from utils import settings as st
+from utils.executors import cpu_executor
+from utils.helpers import generate_token, generate_otp
+from utils.mail_queue import mail_queue
+from utils.security import hash_passwords
+from utils.emails import EmailTemplateRegistry
+from db.db_connection import MongoClientRegistry
+
+IMPORT_FORMATS = ("csv", "ndjson")
+HASH_CHUNK_SIZE = 50
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], import_format: str):
+    """
+    Yield `(row_number, record)` for every non-blank data row. `record` is
+    a dict, or an error message for a row that could not be parsed.
+    """
+    header = None
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if import_format == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line.lstrip("\ufeff")]))]
+            continue
+
+        row_number += 1
+        try:
+            if import_format == "csv":
+                record = dict(zip(header, next(csv.reader([line]))))
+            else:
+                record = json.loads(line)
+        except (ValueError, csv.Error) as e:
+            record = f"Unparsable row: {e}"
+        yield row_number, record
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'row'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def duplicate_message(write_error: dict) -> str:
+    if write_error.get("code") != 11000:
+        return write_error.get("errmsg", "Write failed.")
+    key = write_error.get("keyPattern") or {}
+    if "email" in key:
+        return "Email already registered."
+    if "mobile_no" in key:
+        return "Mobile number already registered."
+    return "Duplicate entry detected."
+
+
+class UserImporter:
+    """
+    Imports one stream of users and collects the per-row outcome.
+    """
+
+    def __init__(self, db, link_base: str, batch_size: int = st.USER_IMPORT_BATCH_SIZE):
+        self.collection = db["accounts"]
+        self.link_base = link_base
+        self.batch_size = batch_size
+        self.received = 0
+        self.inserted = 0
+        self.emails_queued = 0
+        self.emails_not_queued = []
+        self.errors = []
+
+    async def run(self, chunks: AsyncIterator[bytes], import_format: str) -> dict:
+        batch = []
+        async for row_number, record in iter_records(chunks, import_format):
+            self.received += 1
+            user = self._validate(row_number, record)
+            if user is not None:
+                batch.append((row_number, user))
+            if len(batch) >= self.batch_size:
+                await self._import_batch(batch)
+                batch = []
+        if batch:
+            await self._import_batch(batch)
+        return self.report()
+
+    def _validate(self, row_number: int, record):
+        if isinstance(record, str):
+            self.errors.append({"row": row_number, "error": record})
+            return None
+        if isinstance(record, dict) and "confirm_password" not in record:
+            record = {**record, "confirm_password": record.get("password")}
+        try:
+            return UserRegisteration.model_validate(record)
+        except ValidationError as e:
+            self.errors.append({"row": row_number, "error": validation_message(e)})
+            return None
+
+    async def _hash_passwords(self, passwords: list) -> list:
+        chunks = [
+            passwords[start : start + HASH_CHUNK_SIZE]
+            for start in range(0, len(passwords), HASH_CHUNK_SIZE)
+        ]
+        hashed = await asyncio.gather(
+            *(cpu_executor.run(hash_passwords, chunk) for chunk in chunks)
+        )
+        return [password for chunk in hashed for password in chunk]
+
+    async def _import_batch(self, batch: list):
+        hashed = await self._hash_passwords([user.password for _, user in batch])
+
+        documents = []
+        for (_, user), password in zip(batch, hashed):
+            document = user.model_dump(exclude={"confirm_password"})
+            document["password"] = password
+            document["email_verification_token"] = generate_token(email=document["email"])
+            document["email_verification_otp"] = generate_otp()
+            documents.append(document)
+
+        failed = {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as bwe:
+            failed = {err["index"]: err for err in bwe.details.get("writeErrors", [])}
+        except Exception as e:
+            # Earlier batches stay committed; report this one and go on.
+            print(f"User import batch failed: {e}")
+            for row_number, _ in batch:
+                self.errors.append(
+                    {
+                        "row": row_number,
+                        "error": f"Batch write failed, the user may not exist: {e}",
+                    }
+                )
+            return
+
+        emails, email_rows = [], []
+        for index, ((row_number, _), document) in enumerate(zip(batch, documents)):
+            if index in failed:
+                self.errors.append(
+                    {"row": row_number, "error": duplicate_message(failed[index])}
+                )
+                continue
+            link = f"{self.link_base}/api/v1/auth/verify-email?token={document['email_verification_token']}"
+            emails.append(({"user_data": document, "link": link}, [document["email"]]))
+            email_rows.append(row_number)
+
+        self.inserted += len(emails)
+        queued = mail_queue.enqueue_many(
+            template_file=st.REGISTERATION_EMAIL_TEMPLATE,
+            emails=emails,
+            subject="Welcome To Leo Chat.",
+        )
+        self.emails_queued += queued
+        # The mail queue is full; these users were created without an email.
+        self.emails_not_queued.extend(email_rows[queued:])
+
+    def report(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": len(self.errors),
+            "emails_queued": self.emails_queued,
+            # Rows created without an email; they can ask for `/resend-verification-email`.
+            "emails_not_queued": self.emails_not_queued,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+async def read_file(path: str, chunk_size: int = 1 << 16):
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+async def main(path: str, import_format: str):
+    db = MongoClientRegistry.get_database()
+    cpu_executor.start()
+    EmailTemplateRegistry.load()
+    await mail_queue.start()
+    try:
+        importer = UserImporter(db, link_base=st.APP_BASE_URL)
+        report = await importer.run(read_file(path), import_format)
+        print(json.dumps(report, indent=2))
+    finally:
+        await mail_queue.stop(timeout=300)
+        cpu_executor.shutdown()
+        await MongoClientRegistry.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.exit("usage: python -m utils.user_import FILE [--format csv|ndjson]")
+    import_format = "ndjson" if args[0].endswith((".ndjson", ".jsonl")) else "csv"
+    if "--format" in args:
+        import_format = args[args.index("--format") + 1]
+    if import_format not in IMPORT_FORMATS:
+        sys.exit(f"--format must be one of {', '.join(IMPORT_FORMATS)}")
+    asyncio.run(main(args[0], import_format))
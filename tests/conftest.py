@@ -0,0 +1,48 @@
+import operator
+import os
+import sys
+import pytest
+
+# Modules import each other from the `app` directory, as under uvicorn.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis_client():
+    """
+    A fakeredis client installed as the shared `Redis.redis_client`.
+    """
+    import fakeredis
+    from db.redis.redis_connection import Redis
+
+    previous, Redis.redis_client = Redis.redis_client, fakeredis.aioredis.FakeRedis()
+    yield Redis.redis_client
+    await Redis.redis_client.aclose()
+    Redis.redis_client = previous
+
+
+# Query operators understood by `matches`.
+OPERATORS = {"$lt": operator.lt, "$gt": operator.gt, "$ne": operator.ne}
+
+
+def matches(document: dict, query: dict) -> bool:
+    """
+    Evaluate the subset of the Mongo query language the fake collections
+    of these tests need: equality, `$or` and the `OPERATORS`.
+    """
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            (op, value), = condition.items()
+            if not OPERATORS[op](document.get(field), value):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
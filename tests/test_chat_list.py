@@ -0,0 +1,43 @@
+import uuid
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect
+from api.dependencies import is_authenticated_user
+from db.redis.redis_connection import Redis
+from db.redis.recent_messages import recent_messages
+from db.redis.response_cache import chat_list_cache
+import main
+
+ROOM_ID = str(uuid.uuid4())
+
+
+class FailingAggregation:
+    async def to_list(self, length=None):
+        raise AutoReconnect("connection reset")
+
+
+class FailingMessages:
+    def aggregate(self, pipeline, **kwargs):
+        return FailingAggregation()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(Redis, "redis_client", fakeredis.aioredis.FakeRedis(server=server))
+    monkeypatch.setattr(main.app, "db", {"user_messages": FailingMessages()}, raising=False)
+    main.app.dependency_overrides[is_authenticated_user] = lambda: {"user_id": uuid.uuid4()}
+    yield TestClient(main.app), fakeredis.FakeRedis(server=server)
+    main.app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("query", ["", "?page=9&size=50"])
+def test_failed_history_read_is_an_error_and_is_not_cached(client, query):
+    http, redis = client
+
+    response = http.get(f"/api/v1/chat_room/{ROOM_ID}/chats{query}")
+
+    assert response.status_code == 500
+    assert not redis.exists(chat_list_cache.key(ROOM_ID))
+    assert not redis.exists(recent_messages.complete_key(ROOM_ID))
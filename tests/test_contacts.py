@@ -0,0 +1,80 @@
+from utils.contacts import contact_sync_operations, dedupe_contacts, diff_contacts
+
+ACCOUNT = {"email": "owner@leochat.test"}
+
+
+def contact(name, email=None, contact_no="9876543210", has_account=False) -> dict:
+    return {
+        "name": name,
+        "email": email,
+        "contact_no": contact_no,
+        "has_account": has_account,
+    }
+
+
+def test_dedupe_keys_by_email_then_number_and_keeps_the_last_entry():
+    contacts = dedupe_contacts(
+        [
+            contact("Ann", "ann@leochat.test", "1"),
+            contact("Annie", "ann@leochat.test", "2"),
+            contact("Bob", None, "3"),
+            contact("Bobby", "", "3"),
+        ]
+    )
+
+    assert set(contacts) == {("email", "ann@leochat.test"), ("contact_no", "3")}
+    assert contacts[("email", "ann@leochat.test")]["name"] == "Annie"
+    assert contacts[("contact_no", "3")] == contact("Bobby", None, "3")
+
+
+def test_empty_stored_email_equals_a_missing_one():
+    existing = [contact("Bob", "", "3")]
+
+    diff = diff_contacts(existing, dedupe_contacts([contact("Bob", None, "3")]))
+
+    assert diff["unchanged"] == [contact("Bob", None, "3")]
+    assert diff["added"] == diff["updated"] == []
+
+
+def test_diff_reports_added_updated_and_unchanged():
+    existing = [contact("Ann", "ann@leochat.test", "1"), contact("Bob", None, "3")]
+    incoming = dedupe_contacts(
+        [
+            contact("Ann", "ann@leochat.test", "1"),
+            contact("Robert", "", "3"),
+            contact("Cid", "cid@leochat.test", "4"),
+        ]
+    )
+
+    diff = diff_contacts(existing, incoming)
+
+    assert [c["name"] for c in diff["added"]] == ["Cid"]
+    assert [c["name"] for c in diff["updated"]] == ["Robert"]
+    assert [c["name"] for c in diff["unchanged"]] == ["Ann"]
+
+
+def test_operations_push_added_and_target_updated_elements():
+    diff = {
+        "added": [contact("Cid", "cid@leochat.test", "4")],
+        "updated": [
+            contact("Ann", "ann@leochat.test", "1"),
+            contact("Robert", None, "3"),
+        ],
+        "unchanged": [],
+    }
+
+    push, by_email, by_number = contact_sync_operations(ACCOUNT, diff)
+
+    added = push._doc["$push"]["contacts_info"]["$each"]
+    assert [c["name"] for c in added] == ["Cid"]
+    assert by_email._array_filters == [{"contact.email": "ann@leochat.test"}]
+    assert by_number._array_filters == [
+        {"contact.contact_no": "3", "contact.email": {"$in": [None, ""]}}
+    ]
+    assert by_number._doc["$set"]["contacts_info.$[contact].name"] == "Robert"
+
+
+def test_no_changes_means_no_operations():
+    assert contact_sync_operations(
+        ACCOUNT, {"added": [], "updated": [], "unchanged": [contact("Ann")]}
+    ) == []
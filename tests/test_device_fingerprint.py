@@ -0,0 +1,53 @@
+import pytest
+from utils import device_fingerprint
+from utils.device_fingerprint import backfill_device_info, fingerprint
+
+pytestmark = pytest.mark.anyio
+
+IPHONE = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1"
+)
+DESKTOP = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+
+class FakeDevices:
+    def __init__(self, devices: list) -> None:
+        self.devices = devices
+        self.batches = []
+
+    def find(self, filter, projection=None, batch_size=None):
+        async def cursor():
+            for device in self.devices:
+                if device.get("user_agent") is not None:
+                    yield device
+
+        return cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.batches.append(operations)
+
+
+async def test_backfill_parses_each_distinct_user_agent_once(monkeypatch):
+    devices = FakeDevices(
+        [{"_id": n, "user_agent": IPHONE if n % 2 else DESKTOP} for n in range(5)]
+        + [{"_id": 5, "user_agent": None}]
+    )
+    parsed = []
+    real_fingerprint = device_fingerprint.fingerprint
+    monkeypatch.setattr(
+        device_fingerprint,
+        "fingerprint",
+        lambda user_agent: parsed.append(user_agent) or real_fingerprint(user_agent),
+    )
+
+    updated = await backfill_device_info({"devices": devices}, batch_size=10)
+
+    assert updated == 5
+    assert sorted(parsed) == sorted([IPHONE, DESKTOP])
+    updates = {op._filter["_id"]: op._doc["$set"] for op in devices.batches[0]}
+    assert updates[1] == fingerprint(IPHONE)
+    assert updates[0]["device_type"] == "PC"
@@ -0,0 +1,84 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from db.db_parser.parser import history_cursors
+from db.db_parser.pipeline import room_history_pipeline
+from utils.helpers import decode_history_cursor, encode_history_cursor
+from tests.conftest import matches
+
+ROOM_ID = str(uuid.uuid4())
+
+
+def run(pipeline: list, documents: list) -> list:
+    for stage in pipeline:
+        if "$match" in stage:
+            documents = [d for d in documents if matches(d, stage["$match"])]
+        elif "$sort" in stage:
+            reverse = stage["$sort"]["sent_at"] == -1
+            documents = sorted(
+                documents, key=lambda d: (d["sent_at"], d["message_id"]), reverse=reverse
+            )
+        elif "$skip" in stage:
+            documents = documents[stage["$skip"] :]
+        elif "$limit" in stage:
+            documents = documents[: stage["$limit"]]
+    return documents
+
+
+@pytest.fixture
+def messages():
+    # Several messages share each millisecond, so ties hinge on message_id.
+    start = datetime(2026, 1, 1, 12)
+    return [
+        {
+            "room_id": uuid.UUID(ROOM_ID),
+            "message_id": uuid.uuid4(),
+            "sent_at": start + timedelta(milliseconds=n // 4),
+        }
+        for n in range(103)
+    ]
+
+
+def test_cursor_round_trip():
+    sent_at, message_id = datetime(2026, 1, 1, 12, 0, 0, 123000), uuid.uuid4()
+    cursor = encode_history_cursor(sent_at.isoformat(), str(message_id))
+
+    assert "=" not in cursor
+    assert decode_history_cursor(cursor) == (sent_at, message_id)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_history_cursor("not-a-cursor")
+
+
+def test_before_cursors_walk_the_whole_room_without_gaps(messages):
+    seen, before = [], None
+    while True:
+        page = run(room_history_pipeline(ROOM_ID, size=10, before=before), messages)
+        if not page:
+            break
+        seen.extend(page)
+        before = decode_history_cursor(history_cursors(page)["before"])
+
+    newest_first = sorted(
+        messages, key=lambda d: (d["sent_at"], d["message_id"]), reverse=True
+    )
+    assert [d["message_id"] for d in seen] == [d["message_id"] for d in newest_first]
+
+
+def test_after_cursor_returns_the_next_newer_page_newest_first(messages):
+    oldest_page = run(room_history_pipeline(ROOM_ID, page=11, size=10), messages)
+    after = decode_history_cursor(history_cursors(oldest_page)["after"])
+
+    newer = run(room_history_pipeline(ROOM_ID, size=10, after=after), messages)
+    expected = run(room_history_pipeline(ROOM_ID, page=10, size=10), messages)
+
+    assert [d["message_id"] for d in newer] == [d["message_id"] for d in expected]
+
+
+def test_keyset_pages_do_not_skip():
+    pipeline = room_history_pipeline(
+        ROOM_ID, page=5, before=(datetime(2026, 1, 1), uuid.uuid4())
+    )
+    assert not any("$skip" in stage for stage in pipeline)
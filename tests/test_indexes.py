@@ -0,0 +1,53 @@
+import pytest
+from pymongo.errors import OperationFailure
+from db.indexes import INDEXES, IndexCreationError, apply_indexes, require_unique_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCollection:
+    def __init__(self, failing: set) -> None:
+        self.failing = failing
+        self.indexes = []
+
+    async def create_indexes(self, index_models):
+        for index_model in index_models:
+            name = index_model.document["name"]
+            if name in self.failing:
+                raise OperationFailure(f"E11000 duplicate key error building {name}")
+            self.indexes.append(name)
+        return [model.document["name"] for model in index_models]
+
+
+class FakeDatabase(dict):
+    def __init__(self, failing: set = frozenset()) -> None:
+        super().__init__()
+        self.failing = failing
+
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection(self.failing)
+        return collection
+
+
+async def test_one_failing_index_does_not_hold_back_the_others():
+    db = FakeDatabase(failing={"mobile_no_unique"})
+
+    results = await apply_indexes(db)
+
+    assert db["accounts"].indexes == ["email_unique", "user_id_unique"]
+    assert list(results["accounts"]["failed"]) == ["mobile_no_unique"]
+    assert results["user_messages"]["created"] == ["room_history", "room_message"]
+
+
+async def test_failed_unique_index_stops_startup():
+    results = await apply_indexes(FakeDatabase(failing={"mobile_no_unique"}))
+
+    with pytest.raises(IndexCreationError, match="accounts.mobile_no_unique"):
+        require_unique_indexes(results)
+
+
+async def test_failed_plain_index_is_only_reported():
+    results = await apply_indexes(FakeDatabase(failing={"room_history"}))
+
+    require_unique_indexes(results, INDEXES)
+    assert list(results["user_messages"]["failed"]) == ["room_history"]
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+import pytest
+from aiosmtpd.controller import Controller
+from utils.emails import SMTPConfig, EmailTemplateRegistry
+from utils.mail_queue import MailQueue
+from utils import settings as st
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingHandler:
+    """
+    Accepts every message, after rejecting the first `failures` with a
+    transient error.
+    """
+
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return "451 Try again later"
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    def start(failures: int = 0):
+        handler = RecordingHandler(failures)
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        controllers.append(controller)
+        return handler, controller
+
+    controllers = []
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+@pytest.fixture(autouse=True)
+def templates(tmp_path):
+    EmailTemplateRegistry.load(cache_dir=str(tmp_path))
+
+
+def make_queue(controller, **kwargs) -> MailQueue:
+    config = SMTPConfig(
+        smtp_server=controller.hostname,
+        smtp_port=controller.port,
+        from_email="noreply@leochat.test",
+        smtp_passwd=None,
+        use_tls=False,
+    )
+    return MailQueue(config, backoff=0.01, **kwargs)
+
+
+def enqueue(queue: MailQueue, n: int):
+    queue.enqueue(
+        st.REGISTERATION_EMAIL_TEMPLATE,
+        {
+            "user_data": {
+                "email": f"user{n}@leochat.test",
+                "email_verification_otp": "123456",
+            },
+            "link": f"http://localhost/verify/{n}",
+        },
+        [f"user{n}@leochat.test"],
+        "Verify your email",
+    )
+
+
+async def wait_until(condition, timeout: float = 5):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def test_queued_emails_are_delivered_over_one_session(smtp_server):
+    handler, controller = smtp_server()
+    queue = make_queue(controller, pool_size=1)
+    await queue.start()
+    for n in range(5):
+        enqueue(queue, n)
+
+    await wait_until(lambda: queue.sent == 5)
+    await queue.stop()
+
+    assert sorted(e.rcpt_tos[0] for e in handler.messages) == [
+        f"user{n}@leochat.test" for n in range(5)
+    ]
+    assert len(handler.sessions) == 1
+    assert queue.stats()["open_sessions"] == 0
+
+
+async def test_transient_failures_are_retried(smtp_server):
+    handler, controller = smtp_server(failures=2)
+    queue = make_queue(controller, pool_size=1, max_retries=3)
+    await queue.start()
+    enqueue(queue, 1)
+
+    await wait_until(lambda: queue.sent == 1)
+    await queue.stop()
+
+    assert queue.retried == 2
+    assert queue.failed == 0
+    assert len(handler.messages) == 1
+
+
+async def test_email_is_dropped_after_max_retries(smtp_server):
+    handler, controller = smtp_server(failures=10)
+    queue = make_queue(controller, pool_size=1, max_retries=2)
+    await queue.start()
+    enqueue(queue, 1)
+
+    await wait_until(lambda: queue.failed == 1)
+    await queue.stop()
+
+    assert queue.retried == 2
+    assert handler.messages == []
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from sockets.outbound import ConnectionWriter, OverflowPolicy
+
+pytestmark = pytest.mark.anyio
+
+
+class StalledWebSocket:
+    """
+    A peer that never reads: sends and the close handshake hang.
+    """
+
+    def __init__(self) -> None:
+        self.close_started = asyncio.Event()
+
+    async def send_text(self, frame):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000):
+        self.close_started.set()
+        await asyncio.Event().wait()
+
+
+async def test_drop_oldest_keeps_newest_frames():
+    writer = ConnectionWriter(StalledWebSocket(), max_queue_size=2)
+    for frame in ("1", "2", "3"):
+        assert await writer.enqueue(frame)
+
+    assert writer.dropped == 1
+    assert [writer.queue.get_nowait() for _ in range(2)] == ["2", "3"]
+
+
+async def test_disconnecting_a_stalled_peer_does_not_block_the_producer():
+    websocket = StalledWebSocket()
+    writer = ConnectionWriter(
+        websocket,
+        max_queue_size=1,
+        overflow_policy=OverflowPolicy.DISCONNECT,
+        close_timeout=0.1,
+    )
+    await writer.enqueue("1")
+
+    accepted = await asyncio.wait_for(writer.enqueue("2"), timeout=0.05)
+    assert accepted is False
+    assert writer.closed
+    assert not await writer.enqueue("3")
+
+    await asyncio.wait_for(websocket.close_started.wait(), timeout=1)
+    # The close handshake gives up after `close_timeout`.
+    await asyncio.wait_for(writer.close_task, timeout=1)
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from serializer.fast_json import loads
+from serializer.msgpack_codec import pack, unpack
+from sockets.protocols import Frame, MSGPACK_SUBPROTOCOL
+from utils.helpers import to_utc
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def test_uuid_and_aware_datetime_round_trip():
+    message = {
+        "message_id": uuid4(),
+        "sent_at": datetime(2026, 1, 1, 12, 0, 0, 123000, tzinfo=timezone.utc),
+        "read_at": datetime(2026, 1, 1, 17, 30, tzinfo=IST),
+    }
+
+    decoded = unpack(pack(message))
+
+    assert decoded == message
+    assert decoded["sent_at"].tzinfo is not None
+
+
+def test_naive_datetime_round_trips_as_the_same_local_instant():
+    sent_at = datetime(2026, 1, 1, 12, 0, 0, 123000)
+
+    decoded = unpack(pack({"sent_at": sent_at}))["sent_at"]
+
+    assert decoded == sent_at.astimezone(timezone.utc)
+
+
+def test_frame_from_pubsub_renders_like_a_local_frame():
+    message = {"message": "hi", "sent_at": to_utc(datetime(2026, 1, 1, 12, 0, 0, 123000))}
+    local = Frame(message)
+    published = Frame(binary=local.binary)
+
+    assert published.text == local.text
+    assert loads(published.text)["sent_at"].endswith("+00:00")
+    assert published.encoded(MSGPACK_SUBPROTOCOL) == local.binary
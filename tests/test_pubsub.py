@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+import fakeredis
+from sockets.connection_manager import ConnectionManager
+from sockets.pubsub import RoomBroadcaster
+from sockets.protocols import MSGPACK_SUBPROTOCOL
+from serializer.fast_json import loads
+from serializer.msgpack_codec import unpack
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.frames = []
+        self.received = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, frame):
+        self.frames.append(frame)
+        self.received.set()
+
+    async def send_bytes(self, frame):
+        self.frames.append(frame)
+        self.received.set()
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_worker(server: fakeredis.FakeServer) -> ConnectionManager:
+    # Each worker has its own Redis connection to the shared server.
+    client = fakeredis.aioredis.FakeRedis(server=server)
+    return ConnectionManager(broadcaster=RoomBroadcaster(client, poll_timeout=0.05))
+
+
+async def wait_for_frame(websocket: FakeWebSocket):
+    await asyncio.wait_for(websocket.received.wait(), timeout=2)
+    websocket.received.clear()
+
+
+@pytest.fixture
+async def workers():
+    server = fakeredis.FakeServer()
+    first, second = make_worker(server), make_worker(server)
+    await first.start()
+    await second.start()
+    yield first, second
+    await first.stop()
+    await second.stop()
+
+
+async def test_broadcast_reaches_sockets_on_every_worker(workers):
+    first, second = workers
+    local, remote = FakeWebSocket(), FakeWebSocket()
+    await first.connect("room-1", local)
+    await second.connect("room-1", remote, subprotocol=MSGPACK_SUBPROTOCOL)
+
+    await first.broadcast_message("room-1", {"message": "hello"})
+    await wait_for_frame(local)
+    await wait_for_frame(remote)
+
+    assert loads(local.frames[0]) == {"message": "hello"}
+    assert unpack(remote.frames[0]) == {"message": "hello"}
+
+
+async def test_worker_without_sockets_in_room_gets_nothing(workers):
+    first, second = workers
+    local, other_room, remote = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await first.connect("room-1", local)
+    await second.connect("room-2", other_room)
+    await second.connect("room-1", remote)
+    await second.disconnect("room-1", remote)
+
+    await first.broadcast_message("room-1", {"message": "hello"})
+    await wait_for_frame(local)
+    await asyncio.sleep(0.2)
+
+    assert "room-1" not in second.broadcaster.rooms
+    assert remote.frames == []
+    assert other_room.frames == []
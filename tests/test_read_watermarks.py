@@ -0,0 +1,132 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from db.db_connection import MongoClientRegistry
+from db.read_watermarks import ReadWatermarks, resolve_read_at
+from db.redis.recent_messages import RecentMessages
+from db.write_behind import WriteBehindBuffer
+from tests.conftest import matches
+
+pytestmark = pytest.mark.anyio
+
+ROOM_ID, ALICE, BOB = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+NOON = datetime(2026, 1, 1, 12)
+
+
+class FakeCursor:
+    def __init__(self, documents: list) -> None:
+        self.documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """
+    The handful of operations read watermarks use.
+    """
+
+    def __init__(self, documents: list = ()) -> None:
+        self.documents = [dict(document) for document in documents]
+        self.queries = 0
+
+    def _matches(self, filter: dict):
+        return [document for document in self.documents if matches(document, filter)]
+
+    async def find_one(self, filter, projection=None):
+        self.queries += 1
+        found = self._matches(filter)
+        return dict(found[0]) if found else None
+
+    def find(self, filter, projection=None):
+        self.queries += 1
+        return FakeCursor([dict(document) for document in self._matches(filter)])
+
+    async def find_one_and_update(self, filter, update, upsert=False, **kwargs):
+        found = self._matches(filter)
+        if not found:
+            found = [dict(filter)]
+            self.documents.append(found[0])
+        document = found[0]
+        for field, value in update["$max"].items():
+            if field not in document or value > document[field]:
+                document[field] = value
+        document.update(update["$set"])
+        return dict(document)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = {"read_watermarks": FakeCollection(), "user_messages": FakeCollection()}
+    monkeypatch.setattr(MongoClientRegistry, "get_database", lambda *args: db)
+    return db
+
+
+async def test_watermark_never_moves_backwards(db, redis_client):
+    watermarks = ReadWatermarks()
+    await watermarks.mark_read(ALICE, ROOM_ID, NOON)
+
+    stored = await watermarks.mark_read(ALICE, ROOM_ID, NOON - timedelta(minutes=5))
+
+    assert stored == NOON
+    assert await watermarks.room(ROOM_ID) == {str(ALICE): NOON.isoformat()}
+
+
+async def test_room_watermarks_are_loaded_from_mongo_once(db, redis_client):
+    db["read_watermarks"].documents = [
+        {"room_id": ROOM_ID, "user_id": ALICE, "read_at": NOON},
+        {"room_id": ROOM_ID, "user_id": BOB, "read_at": NOON + timedelta(seconds=1)},
+    ]
+    watermarks = ReadWatermarks()
+
+    first = await watermarks.room(ROOM_ID)
+    second = await watermarks.room(ROOM_ID)
+
+    assert first == second == {
+        str(ALICE): NOON.isoformat(),
+        str(BOB): (NOON + timedelta(seconds=1)).isoformat(),
+    }
+    assert db["read_watermarks"].queries == 1
+
+
+async def test_receipt_for_a_written_message_uses_its_sent_at(db, redis_client):
+    message_id = uuid.uuid4()
+    db["user_messages"].documents = [
+        {"room_id": ROOM_ID, "message_id": message_id, "sent_at": NOON}
+    ]
+
+    assert await resolve_read_at(ROOM_ID, message_id=message_id) == NOON
+
+
+async def test_receipt_for_a_buffered_message_is_resolved(db, redis_client):
+    message_id = uuid.uuid4()
+    buffer = WriteBehindBuffer("user_messages")
+    buffer.buffer.append(
+        ({"room_id": ROOM_ID, "message_id": message_id, "sent_at": NOON}, None)
+    )
+
+    read_at = await resolve_read_at(
+        ROOM_ID, message_id=message_id, message_buffer=buffer
+    )
+
+    assert read_at == NOON
+    assert db["user_messages"].queries == 0
+
+
+async def test_receipt_for_a_message_buffered_on_another_worker(db, redis_client):
+    message_id = uuid.uuid4()
+    await RecentMessages().append(
+        str(ROOM_ID), {"message_id": str(message_id), "sent_at": NOON.isoformat()}
+    )
+
+    assert await resolve_read_at(ROOM_ID, message_id=message_id) == NOON
+
+
+async def test_receipt_for_an_unknown_message(db, redis_client):
+    assert await resolve_read_at(ROOM_ID, message_id=uuid.uuid4()) is None
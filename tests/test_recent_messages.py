@@ -0,0 +1,43 @@
+import uuid
+import pytest
+from db.redis.recent_messages import RecentMessages
+
+pytestmark = pytest.mark.anyio
+
+ROOM_ID = str(uuid.uuid4())
+
+
+def message(n: int) -> dict:
+    return {
+        "message_id": f"{n:04d}",
+        "message": f"message {n}",
+        "sent_at": f"2026-01-01T12:00:{n:02d}",
+    }
+
+
+async def test_pages_fall_back_to_mongo_until_hydrated(redis_client):
+    recent = RecentMessages(size=10)
+    await recent.append(ROOM_ID, message(1))
+
+    assert await recent.page(ROOM_ID, page=1, size=5) is None
+
+
+async def test_hydrate_merges_messages_appended_meanwhile(redis_client):
+    recent = RecentMessages(size=10)
+    await recent.append_many(ROOM_ID, [message(5), message(6)])
+
+    # Mongo still lacks the appended messages and overlaps on message 5.
+    assert await recent.hydrate(ROOM_ID, [message(n) for n in (5, 4, 3)])
+
+    page = await recent.page(ROOM_ID, page=1, size=3)
+    assert [m["message_id"] for m in page] == ["0006", "0005", "0004"]
+
+
+async def test_list_is_capped_and_deep_pages_go_to_mongo(redis_client):
+    recent = RecentMessages(size=4)
+    assert await recent.hydrate(ROOM_ID, [])
+    await recent.append_many(ROOM_ID, [message(n) for n in range(10)])
+
+    page = await recent.page(ROOM_ID, page=2, size=2)
+    assert [m["message_id"] for m in page] == ["0007", "0006"]
+    assert await recent.page(ROOM_ID, page=3, size=2) is None
@@ -0,0 +1,47 @@
+import pytest
+from db.redis.response_cache import ResponseCache, etag_matches, make_etag
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"message":"history"}'
+
+
+def test_etag_matching_accepts_weak_and_listed_tags():
+    etag = make_etag(BODY)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+async def test_stored_body_is_served_with_its_etag(redis_client):
+    cache = ResponseCache()
+    _, _, generation = await cache.get("room-1", "page=1")
+    etag = await cache.set("room-1", "page=1", BODY, generation)
+
+    assert await cache.get("room-1", "page=1") == (etag, BODY, generation)
+
+
+async def test_invalidate_drops_every_page_of_the_room(redis_client):
+    cache = ResponseCache()
+    for field in ("page=1", "page=2"):
+        _, _, generation = await cache.get("room-1", field)
+        await cache.set("room-1", field, BODY, generation)
+
+    await cache.invalidate("room-1")
+
+    assert (await cache.get("room-1", "page=1"))[1] is None
+    assert (await cache.get("room-1", "page=2"))[1] is None
+
+
+async def test_page_rendered_before_a_new_message_is_not_stored(redis_client):
+    cache = ResponseCache()
+    _, _, generation = await cache.get("room-1", "page=1")
+
+    # A message arrives while the page is being rendered.
+    await cache.invalidate("room-1")
+    await cache.set("room-1", "page=1", BODY, generation)
+
+    assert (await cache.get("room-1", "page=1"))[1] is None
@@ -0,0 +1,61 @@
+import asyncio
+import uuid
+import pytest
+from db.db_connection import MongoClientRegistry
+from sockets.room_membership import RoomMembershipCache
+
+pytestmark = pytest.mark.anyio
+
+ROOM_ID, ALICE, BOB = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+class FakeRooms:
+    def __init__(self, rooms: dict) -> None:
+        self.rooms = rooms
+        self.queries = 0
+
+    async def find_one(self, filter, projection=None):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        members = self.rooms.get(filter["room_id"])
+        return None if members is None else {"members": members}
+
+
+@pytest.fixture
+def rooms(monkeypatch):
+    rooms = FakeRooms({ROOM_ID: [ALICE, BOB]})
+    monkeypatch.setattr(
+        MongoClientRegistry, "get_database", lambda *args: {"chat_room": rooms}
+    )
+    return rooms
+
+
+async def test_membership_is_loaded_once_and_then_served_from_memory(rooms):
+    cache = RoomMembershipCache()
+
+    assert await cache.is_member(ROOM_ID, ALICE)
+    assert not await cache.is_member(ROOM_ID, uuid.uuid4())
+    assert rooms.queries == 1
+
+
+async def test_concurrent_misses_share_one_query(rooms):
+    cache = RoomMembershipCache()
+
+    results = await asyncio.gather(*(cache.is_member(ROOM_ID, BOB) for _ in range(20)))
+
+    assert all(results)
+    assert rooms.queries == 1
+
+
+async def test_unknown_room_has_no_members(rooms):
+    assert await RoomMembershipCache().members(uuid.uuid4()) is None
+
+
+async def test_invalidate_reloads_membership(rooms):
+    cache = RoomMembershipCache()
+    await cache.members(ROOM_ID)
+    rooms.rooms[ROOM_ID] = [ALICE]
+    cache.invalidate(ROOM_ID)
+
+    assert not await cache.is_member(ROOM_ID, BOB)
+    assert rooms.queries == 2
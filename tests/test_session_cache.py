@@ -0,0 +1,62 @@
+import time
+import uuid
+import pytest
+from db.redis.session_cache import SessionCache
+from utils.cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+USER_ID = uuid.uuid4()
+ACCOUNT = {
+    "user_id": USER_ID,
+    "email": "johndoe@example.com",
+    "is_activated": True,
+    "is_email_verified": True,
+    "password": "pbkdf2-hash",
+}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+async def test_session_is_shared_through_redis_without_secrets(redis_client):
+    await SessionCache().set("device-1", str(USER_ID), "random-1", ACCOUNT, "hash-1")
+
+    # Another worker starts with an empty in-process tier.
+    account, device_hash = await SessionCache().get("device-1", str(USER_ID), "random-1")
+
+    assert device_hash == "hash-1"
+    assert account["user_id"] == USER_ID
+    assert "password" not in account
+
+
+async def test_invalidate_user_drops_both_tiers(redis_client):
+    cache = SessionCache()
+    await cache.set("device-1", str(USER_ID), "random-1", ACCOUNT, "hash-1")
+    await cache.set("device-2", str(USER_ID), "random-2", ACCOUNT, "hash-2")
+    await cache.set("device-3", str(uuid.uuid4()), "random-3", ACCOUNT, "hash-3")
+
+    await cache.invalidate_user(USER_ID)
+
+    assert await cache.get("device-1", str(USER_ID), "random-1") is None
+    assert await cache.get("device-2", str(USER_ID), "random-2") is None
+    assert len(cache.local) == 1
+    assert await redis_client.keys("session:device-1:*") == []
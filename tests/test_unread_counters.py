@@ -0,0 +1,131 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from db.db_connection import MongoClientRegistry
+from db.read_watermarks import unread_after
+from db.reconcile_unread import reconcile_unread
+from db.redis.unread_counters import UnreadCounters, unread_counters
+from db.write_behind import WriteBehindBuffer
+from tests.conftest import OPERATORS, matches
+
+pytestmark = pytest.mark.anyio
+
+ROOM_ID, ALICE, BOB, CAROL = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+NOON = datetime(2026, 1, 1, 12)
+
+
+def evaluate(document: dict, expression):
+    # Just enough aggregation expressions for `room_unread_counts`.
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document[expression[1:]]
+    if not isinstance(expression, dict):
+        return expression
+    (op, args), = expression.items()
+    if op == "$cond":
+        condition, then, otherwise = args
+        return evaluate(document, then if evaluate(document, condition) else otherwise)
+    if op == "$and":
+        return all(evaluate(document, arg) for arg in args)
+    left, right = (evaluate(document, arg) for arg in args)
+    return OPERATORS[op](left, right)
+
+
+class FakeAggregation:
+    def __init__(self, results: list) -> None:
+        self.results = results
+
+    async def to_list(self, length=None):
+        return self.results
+
+
+class FakeCollection:
+    def __init__(self, documents: list = ()) -> None:
+        self.documents = list(documents)
+
+    def _matches(self, filter: dict) -> list:
+        return [document for document in self.documents if matches(document, filter)]
+
+    async def count_documents(self, filter):
+        return len(self._matches(filter))
+
+    def find(self, filter, projection=None, batch_size=None):
+        documents = self._matches(filter)
+
+        async def cursor():
+            for document in documents:
+                yield document
+
+        return cursor()
+
+    def aggregate(self, pipeline):
+        match, group = pipeline[0]["$match"], pipeline[1]["$group"]
+        documents = self._matches(match)
+        if not documents:
+            return FakeAggregation([])
+        result = {
+            field: sum(evaluate(document, accumulator["$sum"]) for document in documents)
+            for field, accumulator in group.items()
+            if field != "_id"
+        }
+        return FakeAggregation([result])
+
+
+def message(sent_by, minutes: int) -> dict:
+    return {
+        "room_id": ROOM_ID,
+        "message_id": uuid.uuid4(),
+        "sent_by": sent_by,
+        "sent_at": NOON + timedelta(minutes=minutes),
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = {
+        "chat_room": FakeCollection([{"room_id": ROOM_ID, "members": [ALICE, BOB]}]),
+        "user_messages": FakeCollection(
+            [message(ALICE, 1), message(BOB, 2), message(BOB, 3), message(ALICE, 4)]
+        ),
+        "read_watermarks": FakeCollection(
+            [{"room_id": ROOM_ID, "user_id": ALICE, "read_at": NOON + timedelta(minutes=2)}]
+        ),
+    }
+    monkeypatch.setattr(MongoClientRegistry, "get_database", lambda *args: db)
+    return db
+
+
+async def test_send_increments_and_read_sets_counters(redis_client):
+    counters = UnreadCounters()
+    await counters.increment(ROOM_ID, [ALICE, BOB], count=3)
+    await counters.set(ALICE, ROOM_ID, 1)
+    await counters.set(BOB, ROOM_ID, 0)
+
+    assert await counters.counts(ALICE) == {str(ROOM_ID): 1}
+    assert await counters.counts(BOB) == {}
+
+
+async def test_read_up_to_an_older_message_keeps_newer_ones_unread(db):
+    # Bob sent the messages at 12:02 and 12:03; Alice read up to 12:01.
+    read_at = NOON + timedelta(minutes=1)
+
+    assert await unread_after(ROOM_ID, ALICE, read_at) == 2
+    assert await unread_after(ROOM_ID, ALICE, NOON + timedelta(minutes=3)) == 0
+
+
+async def test_unwritten_messages_count_as_unread(db):
+    buffer = WriteBehindBuffer("user_messages")
+    buffer.buffer.append((message(BOB, 5), None))
+
+    assert await unread_after(ROOM_ID, ALICE, NOON + timedelta(minutes=3), buffer) == 1
+
+
+async def test_reconcile_rebuilds_counters_and_drops_stale_users(db, redis_client):
+    await unread_counters.increment(ROOM_ID, [ALICE, BOB, CAROL], count=7)
+
+    report = await reconcile_unread(db)
+
+    # Alice read up to 12:02, Bob never read: Alice sent 12:01 and 12:04.
+    assert await unread_counters.counts(ALICE) == {str(ROOM_ID): 1}
+    assert await unread_counters.counts(BOB) == {str(ROOM_ID): 2}
+    assert await unread_counters.counts(CAROL) == {}
+    assert report["stale_users"] == 1
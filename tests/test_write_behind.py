@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from pymongo.errors import BulkWriteError
+from db.write_behind import WriteBehindBuffer, DurabilityMode
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCollection:
+    def __init__(self, delay: float = 0, duplicates: set = ()) -> None:
+        self.delay = delay
+        self.duplicates = set(duplicates)
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(self.delay)
+        self.batches.append([document["n"] for document in documents])
+        errors = [
+            {"index": index, "errmsg": "duplicate key"}
+            for index, document in enumerate(documents)
+            if document["n"] in self.duplicates
+        ]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+async def started_buffer(collection, **kwargs) -> WriteBehindBuffer:
+    buffer = WriteBehindBuffer("user_messages", **kwargs)
+    await buffer.start(db={"user_messages": collection})
+    return buffer
+
+
+async def test_message_in_a_quiet_buffer_is_written_right_away():
+    collection = FakeCollection()
+    buffer = await started_buffer(collection, flush_interval=10)
+
+    await asyncio.wait_for(buffer.enqueue({"n": 1}), timeout=0.5)
+
+    assert collection.batches == [[1]]
+    await buffer.stop()
+
+
+async def test_messages_arriving_during_a_write_share_the_next_batch():
+    collection = FakeCollection(delay=0.05)
+    buffer = await started_buffer(collection, flush_interval=10)
+
+    first = asyncio.create_task(buffer.enqueue({"n": 1}))
+    await asyncio.sleep(0.01)
+    await asyncio.gather(first, *(buffer.enqueue({"n": n}) for n in range(2, 6)))
+
+    assert collection.batches == [[1], [2, 3, 4, 5]]
+    await buffer.stop()
+
+
+async def test_failed_document_fails_only_its_own_sender():
+    collection = FakeCollection(duplicates={2})
+    buffer = await started_buffer(collection)
+
+    written = await buffer.enqueue_many([{"n": 1}, {"n": 2}])
+
+    assert written == [True, False]
+    assert buffer.stats()["flushed"] == 1
+    assert buffer.stats()["failed"] == 1
+    await buffer.stop()
+
+
+async def test_enqueue_durability_returns_before_the_write_and_stop_flushes():
+    collection = FakeCollection(delay=0.05)
+    buffer = await started_buffer(collection, durability=DurabilityMode.ENQUEUE)
+
+    written = await asyncio.wait_for(
+        buffer.enqueue_many([{"n": 1}, {"n": 2}]), timeout=0.01
+    )
+    assert written == [True, True]
+    await buffer.stop()
+
+    assert collection.batches == [[1, 2]]
@@ -0,0 +1,71 @@
+import uuid
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from api import dependencies
+from db.redis.redis_connection import Redis
+from db.redis.recent_messages import recent_messages
+from db.redis.unread_counters import unread_counters
+from sockets import chat_manager, room_membership
+import main
+
+ROOM_ID, ALICE, BOB = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+class FakeMessages:
+    def __init__(self, fail: bool) -> None:
+        self.fail = fail
+        self.documents = []
+
+    async def insert_many(self, documents, ordered=True):
+        if self.fail:
+            raise ConnectionError("connection reset")
+        self.documents.extend(documents)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(Redis, "redis_client", fakeredis.aioredis.FakeRedis(server=server))
+    async def find_device_account(db, user_id, device_id):
+        return {"user_id": ALICE, "email": "alice@leochat.test"}
+
+    # The socket route is added outside the router, so dependency overrides miss it.
+    monkeypatch.setattr(dependencies, "find_device_account", find_device_account)
+    room_membership.set(ROOM_ID, [ALICE, BOB])
+    yield TestClient(main.app), fakeredis.FakeRedis(server=server)
+    room_membership.invalidate(ROOM_ID)
+
+
+def send(http: TestClient, messages, fail: bool, monkeypatch):
+    collection = FakeMessages(fail)
+    monkeypatch.setattr(chat_manager.message_buffer, "db", {"user_messages": collection})
+    headers = {"user-id": str(ALICE), "device-id": "device-1"}
+    url = f"/ws/chat?room_id={ROOM_ID}"
+    with http.websocket_connect(url, headers=headers) as websocket:
+        websocket.send_json(messages)
+        return websocket.receive_json(), collection
+
+
+def test_written_message_is_listed_counted_and_broadcast(client, monkeypatch):
+    http, redis = client
+
+    frame, collection = send(http, {"message": "hello"}, False, monkeypatch)
+
+    assert frame["message"] == "hello"
+    assert len(collection.documents) == 1
+    assert redis.llen(recent_messages.key(str(ROOM_ID))) == 1
+    assert redis.hgetall(unread_counters.key(BOB)) == {str(ROOM_ID).encode(): b"1"}
+
+
+def test_unwritten_message_is_reported_to_the_sender_only(client, monkeypatch):
+    http, redis = client
+    message_id = str(uuid.uuid4())
+
+    frame, _ = send(
+        http, {"message_id": message_id, "message": "hello"}, True, monkeypatch
+    )
+
+    assert frame == {"type": "error", "failed_message_ids": [message_id]}
+    assert redis.llen(recent_messages.key(str(ROOM_ID))) == 0
+    assert redis.hgetall(unread_counters.key(BOB)) == {}